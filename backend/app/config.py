@@ -15,9 +15,77 @@ class Settings(BaseSettings):
 
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "llama3"
+    ollama_timeout_seconds: float = 60.0
+    ollama_connect_timeout_seconds: float = 5.0
+    ollama_max_connections: int = 10
+    ollama_max_keepalive_connections: int = 5
+    ollama_keepalive_expiry_seconds: float = 30.0
+
+    gemini_first_chunk_timeout_seconds: float = 5.0
+
+    gemini_max_concurrency: int = 8
+    gemini_max_queue: int = 32
+    ollama_max_concurrency: int = 2
+    ollama_max_queue: int = 16
+    llm_queue_timeout_seconds: float = 10.0
+
+    llm_health_window: int = 50
+    llm_breaker_error_rate: float = 0.5
+    llm_breaker_min_requests: int = 5
+    llm_breaker_cooldown_seconds: float = 30.0
+    llm_hedge_enabled: bool = False
+    llm_hedge_min_delay_seconds: float = 0.5
+
+    llm_cache_max_entries: int = 512
+    llm_cache_max_bytes: int = 4 * 1024 * 1024
+    llm_cache_ttl_seconds: int = 3600
+
+    # Load the LLM SDK and numpy and start the trend workers right after
+    # startup, in the background, instead of on first use.
+    warm_up_on_startup: bool = False
+
+    trend_pool_workers: int = 2
+    trend_pool_max_pending: int = 8
+    trend_timeout_seconds: float = 5.0
+    trend_inline_max_rows: int = 2000
+
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_queue: int = 32
+    password_hash_queue_timeout_seconds: float = 5.0
+
+    user_cache_max_entries: int = 10_000
+    user_cache_ttl_seconds: float = 60.0
+
+    guest_store_backend: str = "memory"
+    redis_url: str = "redis://localhost:6379/0"
+    guest_max_readings: int = 5000
+    guest_max_medicines: int = 500
+    guest_store_max_bytes: int = 64 * 1024 * 1024
+    guest_sweep_interval_seconds: float = 300.0
+
+    availability_cache_max_entries: int = 50_000
+    availability_cache_ttl_seconds: float = 30.0
+
+    bulk_ingest_chunk_rows: int = 5000
+    bulk_ingest_max_record_bytes: int = 64 * 1024
 
     db_pool_size: int = 10
     db_max_overflow: int = 20
+    # Unset: on for server databases, off for SQLite.
+    db_pool_pre_ping: Optional[bool] = None
+    # A streaming replica for read-only routes; users stay on the primary for
+    # read_your_writes_seconds after they write.
+    read_database_url: Optional[str] = None
+    read_your_writes_seconds: float = 5.0
+
+    sqlite_pool_size: int = 5
+    sqlite_max_overflow: int = 10
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kb: int = 64 * 1024
+    sqlite_mmap_size_bytes: int = 256 * 1024 * 1024
 
     @property
     def cors_origin_list(self) -> List[str]:
@@ -1,17 +1,237 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .config import get_settings
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
-engine = create_async_engine(
-    settings.database_url,
-    pool_pre_ping=True,
+
+def sqlite_pragmas() -> dict:
+    """PRAGMAs set on every new SQLite connection.
+
+    WAL lets readers run alongside the single writer, and with
+    ``synchronous=NORMAL`` a commit appends to the WAL without an fsync (a
+    power loss can drop the last commits but not corrupt the file).
+    ``busy_timeout`` makes a writer wait for the lock instead of failing.
+    """
+    return {
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "cache_size": -settings.sqlite_cache_size_kb,  # negative means KiB, not pages
+        "mmap_size": settings.sqlite_mmap_size_bytes,
+    }
+
+
+def create_engine(url: str, pragmas: Optional[dict] = None) -> AsyncEngine:
+    """An engine with the database profile for ``url``.
+
+    Server databases get the configured pool size and overflow. SQLite gets
+    ``pragmas`` (``sqlite_pragmas()`` by default) on every connection and no
+    pre-ping, as there is no server to go away. A SQLite file also gets a
+    small pool instead of aiosqlite's default of a new connection (and
+    thread) per checkout: there is only one writer at a time, and writers
+    queue fairly for a pooled connection but starve in SQLite's busy
+    handler. The overflow keeps long-lived sessions (a streamed export, say)
+    from stalling everyone else on the pool timeout. ``DB_POOL_PRE_PING``
+    overrides pre-ping either way.
+    """
+    url_info = make_url(url)
+    is_sqlite = url_info.get_backend_name() == "sqlite"
+    pre_ping = settings.db_pool_pre_ping
+    options = {"pool_pre_ping": (not is_sqlite) if pre_ping is None else pre_ping}
+    if not is_sqlite:
+        options.update(pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
+    elif url_info.database not in (None, "", ":memory:") and "mode=memory" not in str(url_info):
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.sqlite_pool_size,
+            max_overflow=settings.sqlite_max_overflow,
+        )
+    new_engine = create_async_engine(url, **options)
+
+    if is_sqlite:
+        pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _set_pragmas(dbapi_connection, connection_record) -> None:
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return new_engine
+
+
+class PrimaryPins:
+    """Who wrote recently, so their reads go to the primary until replicas catch up.
+
+    Keyed by username and kept per process: with several workers, a read that
+    lands on another worker than the write isn't pinned.
+    """
+
+    def __init__(self, window_seconds: float, max_entries: int = 100_000):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._until: "OrderedDict[str, float]" = OrderedDict()
+        self.primary_reads = 0
+        self.replica_reads = 0
+
+    def pin(self, key: str) -> None:
+        self._until[key] = time.monotonic() + self.window_seconds
+        self._until.move_to_end(key)
+        while len(self._until) > self.max_entries:
+            self._until.popitem(last=False)
+
+    def is_pinned(self, key: Optional[str]) -> bool:
+        until = self._until.get(key) if key is not None else None
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            del self._until[key]
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "pinned": len(self._until),
+            "primary_reads": self.primary_reads,
+            "replica_reads": self.replica_reads,
+        }
+
+
+primary_pins = PrimaryPins(settings.read_your_writes_seconds)
+
+
+def set_session_owner(request: Request, username: str) -> None:
+    """Record whose request this is; sessions look it up when they commit or pick an engine."""
+    request.state.session_owner = username
+
+
+def _owner(session: Session) -> Optional[str]:
+    state = session.info.get("request_state")
+    return getattr(state, "session_owner", None)
+
+
+class _WriteSession(Session):
+    """Primary session that pins its request's user after committing a write."""
+
+
+class _ReadSession(Session):
+    """Replica session that falls back to the primary while its user is pinned."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if primary_pins.is_pinned(_owner(self)):
+            primary_pins.primary_reads += 1
+            return engine.sync_engine
+        primary_pins.replica_reads += 1
+        return read_engine.sync_engine
+
+
+@event.listens_for(_WriteSession, "after_flush")
+def _flushed(session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(_WriteSession, "do_orm_execute")
+def _executed(orm_execute_state) -> None:
+    # Core INSERT/UPDATE/DELETE run through session.execute skip the flush.
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(_WriteSession, "after_commit")
+def _pin_after_write(session) -> None:
+    if session.info.pop("wrote", False) and read_engine is not None:
+        owner = _owner(session)
+        if owner is not None:
+            primary_pins.pin(owner)
+
+
+@event.listens_for(_WriteSession, "after_rollback")
+def _forget_write(session) -> None:
+    session.info.pop("wrote", None)
+
+
+engine = create_engine(settings.database_url)
+AsyncSessionLocal = sessionmaker(
+    engine, class_=AsyncSession, sync_session_class=_WriteSession, expire_on_commit=False
+)
+# Without READ_DATABASE_URL, reads use the primary like everything else.
+read_engine = create_engine(settings.read_database_url) if settings.read_database_url else None
+AsyncReadSessionLocal = (
+    sessionmaker(
+        read_engine, class_=AsyncSession, sync_session_class=_ReadSession, expire_on_commit=False
+    )
+    if read_engine is not None
+    else AsyncSessionLocal
 )
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
+async def get_db(request: Request):
+    async with AsyncSessionLocal(info={"request_state": request.state}) as session:
+        yield session
+
+
+async def get_read_db(request: Request, db: AsyncSession = Depends(get_db)):
+    """Session for read-only routes: the read replica when configured, else the primary.
+
+    Without a replica this is the request's ``get_db`` session, so a request
+    that depends on both holds one pooled connection, not two. (Sessions
+    check out a connection on first use, so with a replica the unused
+    primary session costs nothing.) Don't write through it; a replica
+    rejects writes.
+    """
+    if read_engine is None:
+        yield db
+        return
+    async with AsyncReadSessionLocal(info={"request_state": request.state}) as session:
         yield session
+
+
+def dialect_insert(db: AsyncSession, model):
+    """INSERT for the session's dialect, so callers can use ``on_conflict_do_update``."""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def upgrade_schema(conn) -> None:
+    """Add columns and indexes that ``create_all`` skips on tables that already exist.
+
+    Columns are added nullable; a model that needs them filled backfills them itself.
+    """
+    inspector = inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            conn.execute(text(
+                f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} "
+                f"{column.type.compile(dialect=conn.dialect)}"
+            ))
+            logger.info("Added column %s.%s", table.name, column.name)
+        for index in table.indexes:
+            try:
+                with conn.begin_nested():
+                    index.create(conn, checkfirst=True)
+            except DBAPIError:
+                # e.g. a new unique index that rows stored before it violate
+                logger.warning("Could not create index %s", index.name, exc_info=True)
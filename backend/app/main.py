@@ -1,24 +1,51 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import asyncio
 from contextlib import asynccontextmanager
 
-from .database import engine, Base
+from .database import engine, read_engine, primary_pins
 from .routers import auth, health, chat, appointments
-from .models import user, appointment, health_data # Ensure all models are imported
+from .models import user, appointment, doctor_schedule, health_data, trend_stats, trend_results, rollups # Ensure all models are imported
 from .config import get_settings
+from .services.gemini_service import GeminiService
+from .services.availability import availability_cache
+from .services.guest_store import create_guest_store
+from .services.prediction_service import PredictionService
+from .utils.admission import AdmissionRejected
+from .utils.security import password_hasher
+from .utils.user_cache import user_cache
 
 settings = get_settings()
 
-# Create tables on startup
+async def _warm_up(app: FastAPI) -> None:
+    await asyncio.gather(
+        app.state.gemini_service.warm_up(), app.state.prediction_service.warm_up()
+    )
+
+
+# The schema is created and upgraded by `python -m app.manage init-db`, not on every boot.
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    app.state.gemini_service = GeminiService()
+    app.state.prediction_service = PredictionService()
+    await app.state.prediction_service.start()
+    app.state.guest_store = create_guest_store()
+    await app.state.guest_store.start()
+    # Heavy imports happen on first use; optionally get them done in the background.
+    warm_up = asyncio.create_task(_warm_up(app)) if settings.warm_up_on_startup else None
     yield
     # Shutdown
-    pass
+    if warm_up is not None:
+        warm_up.cancel()
+    await app.state.guest_store.aclose()
+    await app.state.prediction_service.aclose()
+    await app.state.gemini_service.aclose()
+    password_hasher.shutdown()
+    await engine.dispose()
+    if read_engine is not None:
+        await read_engine.dispose()
 
 app = FastAPI(
     title="Intelligent Health Monitoring System",
@@ -26,6 +53,14 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -33,6 +68,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
@@ -46,4 +82,16 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "llm": app.state.gemini_service.stats(),
+        "trends": app.state.prediction_service.stats(),
+        "users": user_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "guests": app.state.guest_store.stats(),
+        "availability": availability_cache.stats(),
+        "read_replica": primary_pins.stats() if read_engine is not None else None,
+    }
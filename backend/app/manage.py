@@ -0,0 +1,176 @@
+"""Maintenance commands, run from ``backend/``::
+
+    python -m app.manage init-db
+    python -m app.manage rebuild-trend-stats [--user-id ID]
+    python -m app.manage rebuild-rollups [--user-id ID]
+    python -m app.manage cohort-trends [--days 30] [--workers N] [--bp-threshold 130]
+    python -m app.manage set-doctor-hours --doctor NAME --weekdays 0-4 --hours 09:00-12:00 --hours 13:00-17:00
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import delete, select
+
+from .database import AsyncSessionLocal, Base, engine, upgrade_schema
+from .models import user, appointment, doctor_schedule, health_data, rollups as rollup_models, trend_results, trend_stats as trend_models  # noqa: F401
+from .models.doctor_schedule import DoctorSchedule
+from .models.user import User
+from .services import rollups, scheduling, trend_stats
+from .services.cohort_trends import DEFAULT_BP_THRESHOLD, run_cohort_trends
+
+
+async def init_db(args) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+        await conn.run_sync(scheduling.prepare_schema)
+    print("Database schema is up to date")
+
+
+async def rebuild_trend_stats(args) -> None:
+    async with AsyncSessionLocal() as db:
+        if args.user_id is not None:
+            user_ids = [args.user_id]
+        else:
+            user_ids = (await db.execute(select(User.id))).scalars().all()
+        for user_id in user_ids:
+            await trend_stats.rebuild_trend_stats(db, user_id)
+            await db.commit()
+    print(f"Rebuilt trend statistics for {len(user_ids)} user(s)")
+
+
+async def rebuild_rollups(args) -> None:
+    async with AsyncSessionLocal() as db:
+        if args.user_id is not None:
+            user_ids = [args.user_id]
+        else:
+            user_ids = (await db.execute(select(User.id))).scalars().all()
+        buckets = 0
+        for user_id in user_ids:
+            buckets += await rollups.rebuild_rollups(db, user_id)
+            await db.commit()
+    print(f"Rebuilt {buckets} rollup bucket(s) for {len(user_ids)} user(s)")
+
+
+async def cohort_trends(args) -> None:
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        run = await run_cohort_trends(
+            db,
+            days=args.days,
+            chunk_rows=args.chunk_rows,
+            workers=args.workers,
+            bp_threshold=args.bp_threshold,
+            keep_runs=args.keep_runs,
+        )
+    print(
+        f"Run {run.id}: fitted {run.users} user(s), {run.flagged} with worsening "
+        f"blood pressure ({time.perf_counter() - started:.1f}s)"
+    )
+
+
+def _weekdays(value: str) -> list:
+    days = set()
+    for part in value.split(","):
+        first, _, last = part.partition("-")
+        days.update(range(int(first), int(last or first) + 1))
+    if not days <= set(range(7)):
+        raise argparse.ArgumentTypeError("weekdays run from 0 (Monday) to 6 (Sunday)")
+    return sorted(days)
+
+
+def _hours(value: str) -> tuple:
+    try:
+        start, end = (time.strptime(t, "%H:%M") for t in value.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("hours look like 09:00-17:00")
+    start_minute, end_minute = start.tm_hour * 60 + start.tm_min, end.tm_hour * 60 + end.tm_min
+    if end_minute <= start_minute:
+        raise argparse.ArgumentTypeError("hours must end after they start")
+    return start_minute, end_minute
+
+
+async def set_doctor_hours(args) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            delete(DoctorSchedule)
+            .where(DoctorSchedule.doctor_name == args.doctor)
+            .where(DoctorSchedule.weekday.in_(args.weekdays))
+        )
+        db.add_all(
+            DoctorSchedule(
+                doctor_name=args.doctor, weekday=weekday, start_minute=start, end_minute=end
+            )
+            for weekday in args.weekdays
+            for start, end in args.hours or []
+        )
+        await db.commit()
+    print(f"Set working hours for {args.doctor} on {len(args.weekdays)} weekday(s)")
+
+
+COMMANDS = {
+    "init-db": init_db,
+    "rebuild-trend-stats": rebuild_trend_stats,
+    "rebuild-rollups": rebuild_rollups,
+    "cohort-trends": cohort_trends,
+    "set-doctor-hours": set_doctor_hours,
+}
+
+
+async def _run(command, args) -> None:
+    try:
+        await command(args)
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser(
+        "init-db", help="Create missing tables, columns and indexes; run before starting the API"
+    )
+
+    rebuild = sub.add_parser(
+        "rebuild-trend-stats", help="Recompute incremental trend state from health_data"
+    )
+    rebuild.add_argument("--user-id", type=int, help="Only rebuild this user")
+
+    rebuild_rollup = sub.add_parser(
+        "rebuild-rollups", help="Recompute hourly and daily health_data rollups"
+    )
+    rebuild_rollup.add_argument("--user-id", type=int, help="Only rebuild this user")
+
+    cohort = sub.add_parser(
+        "cohort-trends", help="Fit trends for every user and store them in trend_results"
+    )
+    cohort.add_argument("--days", type=int, default=30, help="Window of readings to fit")
+    cohort.add_argument("--chunk-rows", type=int, default=50_000, help="Rows per worker batch")
+    cohort.add_argument("--workers", type=int, default=0, help="Worker processes (default: CPU count)")
+    cohort.add_argument(
+        "--bp-threshold", type=float, default=DEFAULT_BP_THRESHOLD,
+        help="Flag rising systolic pressure projected to reach this value",
+    )
+    cohort.add_argument("--keep-runs", type=int, default=7, help="Runs to keep (0 keeps all)")
+
+    hours = sub.add_parser(
+        "set-doctor-hours", help="Replace a doctor's working hours (UTC) on some weekdays"
+    )
+    hours.add_argument("--doctor", required=True, help="Name as used in appointments")
+    hours.add_argument(
+        "--weekdays", type=_weekdays, default=list(range(5)),
+        help="e.g. 0-4 or 0,2,4 (0 = Monday; default Monday to Friday)",
+    )
+    hours.add_argument(
+        "--hours", type=_hours, action="append",
+        help="HH:MM-HH:MM, repeatable; omit to mark the days as off",
+    )
+
+    args = parser.parse_args(argv)
+    asyncio.run(_run(COMMANDS[args.command], args))
+
+
+if __name__ == "__main__":
+    main()
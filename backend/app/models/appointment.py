@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
+from sqlalchemy.orm import relationship
+from ..database import Base
+
+DEFAULT_DURATION_MINUTES = 30
+MAX_DURATION_MINUTES = 8 * 60
+
+class Appointment(Base):
+    __tablename__ = "appointments"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    doctor_name = Column(String)
+    appointment_date = Column(DateTime(timezone=True), index=True)
+    # end_date is appointment_date + duration, stored so overlap checks are plain range comparisons.
+    duration_minutes = Column(Integer, default=DEFAULT_DURATION_MINUTES)
+    end_date = Column(DateTime(timezone=True))
+    reason = Column(Text)
+    status = Column(String, default="scheduled")
+    
+    user = relationship("User")
+
+    __table_args__ = (
+        Index("ix_appointments_user_date", "user_id", "appointment_date"),
+        Index("ix_appointments_doctor_date", "doctor_name", "appointment_date"),
+        # Two live bookings can't start at the same moment. Overlaps in general are
+        # checked in services/scheduling.py, and by an exclusion constraint on PostgreSQL.
+        Index(
+            "uq_appointments_user_start_live",
+            "user_id",
+            "appointment_date",
+            unique=True,
+            sqlite_where=status != "cancelled",
+            postgresql_where=status != "cancelled",
+        ),
+    )
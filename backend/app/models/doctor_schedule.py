@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String
+from ..database import Base
+
+
+class DoctorSchedule(Base):
+    """A doctor's working hours on one weekday, in UTC. A day may have several rows (split shifts)."""
+
+    __tablename__ = "doctor_schedules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    doctor_name = Column(String, nullable=False, index=True)
+    weekday = Column(Integer, nullable=False)  # 0 = Monday
+    start_minute = Column(Integer, nullable=False)  # minutes after midnight
+    end_minute = Column(Integer, nullable=False)
@@ -0,0 +1,60 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String
+from ..database import Base
+
+
+class HealthDataRollup(Base):
+    """Hourly or daily aggregate of one user's ``health_data`` rows.
+
+    Each vital keeps count/min/max/sum (mean = sum / count) and its latest
+    value with that reading's timestamp, so batches can arrive out of order.
+    """
+
+    __tablename__ = "health_data_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    resolution = Column(String, primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    last_timestamp = Column(DateTime(timezone=True), nullable=False)
+
+    heart_rate_count = Column(Integer, nullable=False, default=0)
+    heart_rate_min = Column(Float)
+    heart_rate_max = Column(Float)
+    heart_rate_sum = Column(Float, nullable=False, default=0.0)
+    heart_rate_last = Column(Float)
+    heart_rate_last_at = Column(DateTime(timezone=True))
+
+    blood_pressure_systolic_count = Column(Integer, nullable=False, default=0)
+    blood_pressure_systolic_min = Column(Float)
+    blood_pressure_systolic_max = Column(Float)
+    blood_pressure_systolic_sum = Column(Float, nullable=False, default=0.0)
+    blood_pressure_systolic_last = Column(Float)
+    blood_pressure_systolic_last_at = Column(DateTime(timezone=True))
+
+    blood_pressure_diastolic_count = Column(Integer, nullable=False, default=0)
+    blood_pressure_diastolic_min = Column(Float)
+    blood_pressure_diastolic_max = Column(Float)
+    blood_pressure_diastolic_sum = Column(Float, nullable=False, default=0.0)
+    blood_pressure_diastolic_last = Column(Float)
+    blood_pressure_diastolic_last_at = Column(DateTime(timezone=True))
+
+    temperature_count = Column(Integer, nullable=False, default=0)
+    temperature_min = Column(Float)
+    temperature_max = Column(Float)
+    temperature_sum = Column(Float, nullable=False, default=0.0)
+    temperature_last = Column(Float)
+    temperature_last_at = Column(DateTime(timezone=True))
+
+    weight_count = Column(Integer, nullable=False, default=0)
+    weight_min = Column(Float)
+    weight_max = Column(Float)
+    weight_sum = Column(Float, nullable=False, default=0.0)
+    weight_last = Column(Float)
+    weight_last_at = Column(DateTime(timezone=True))
+
+    blood_sugar_count = Column(Integer, nullable=False, default=0)
+    blood_sugar_min = Column(Float)
+    blood_sugar_max = Column(Float)
+    blood_sugar_sum = Column(Float, nullable=False, default=0.0)
+    blood_sugar_last = Column(Float)
+    blood_sugar_last_at = Column(DateTime(timezone=True))
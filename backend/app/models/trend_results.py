@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String, Boolean, JSON, Index
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class TrendRun(Base):
+    """One execution of the cohort trend job."""
+
+    __tablename__ = "trend_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+    window_days = Column(Integer, nullable=False)
+    users = Column(Integer, nullable=False, default=0)
+    flagged = Column(Integer, nullable=False, default=0)
+
+
+class TrendResult(Base):
+    """Trend fit for one user and metric from a cohort run."""
+
+    __tablename__ = "trend_results"
+
+    run_id = Column(Integer, ForeignKey("trend_runs.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    metric = Column(String, primary_key=True)
+    readings = Column(Integer, nullable=False)
+    slope = Column(Float, nullable=False)
+    current_trend = Column(String, nullable=False)
+    trend_strength = Column(Float, nullable=False)
+    next_7_days = Column(JSON, nullable=False)
+    worsening = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index("ix_trend_results_run_worsening", "run_id", "worsening"),
+    )
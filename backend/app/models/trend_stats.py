@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey, String, Boolean
+from ..database import Base
+
+
+class TrendState(Base):
+    """Per-user reading counter that numbers readings for the trend fit."""
+
+    __tablename__ = "trend_state"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    next_seq = Column(Integer, nullable=False, default=0)
+    last_timestamp = Column(DateTime(timezone=True))
+    # Set when a reading arrives out of timestamp order; forces a rebuild.
+    stale = Column(Boolean, nullable=False, default=False)
+
+
+class TrendBucket(Base):
+    """Running least-squares sums for one user, metric and UTC day.
+
+    Sums are taken over x = seq - base_seq so they stay small; the special
+    metric ``"_rows"`` counts every reading so the window's first seq and
+    row count are known.
+    """
+
+    __tablename__ = "trend_buckets"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    metric = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    base_seq = Column(Integer, nullable=False)
+    n = Column(Integer, nullable=False, default=0)
+    sx = Column(Float, nullable=False, default=0.0)
+    sy = Column(Float, nullable=False, default=0.0)
+    sxx = Column(Float, nullable=False, default=0.0)
+    sxy = Column(Float, nullable=False, default=0.0)
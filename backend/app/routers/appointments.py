@@ -1,21 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
-from datetime import datetime, timezone
-from pydantic import BaseModel
-
-from ..database import get_db
-from ..models.appointment import Appointment
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+
+from ..database import get_db, get_read_db
+from ..models.appointment import DEFAULT_DURATION_MINUTES, MAX_DURATION_MINUTES, Appointment
+from ..services.availability import find_free_slots
+from ..services.scheduling import BookingConflict, book_appointments
+from ..services.trend_stats import as_utc
+from ..utils.pagination import apply_keyset, finish_page
 from ..utils.security import get_authenticated_user
 
 router = APIRouter()
 
+MAX_BULK_APPOINTMENTS = 1000
+MAX_SLOT_SEARCH_DOCTORS = 50
+
 
 class AppointmentCreate(BaseModel):
     doctor_name: str
     appointment_date: datetime
+    duration_minutes: int = Field(DEFAULT_DURATION_MINUTES, ge=5, le=MAX_DURATION_MINUTES)
     reason: str
 
+    @field_validator("appointment_date")
+    @classmethod
+    def _assume_utc(cls, value: datetime) -> datetime:
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+
 
 @router.post("/")
 async def create_appointment(
@@ -23,53 +39,71 @@ async def create_appointment(
     current_user=Depends(get_authenticated_user),
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(
-        select(Appointment).where(
-            and_(
-                Appointment.user_id == current_user.id,
-                Appointment.appointment_date == payload.appointment_date,
-                Appointment.status != "cancelled",
-            )
-        )
-    )
-    existing = result.scalar_one_or_none()
-
-    if existing:
+    try:
+        created, conflicts = await book_appointments(db, current_user.id, [payload])
+    except BookingConflict:
+        raise HTTPException(status_code=409, detail="Time slot was booked concurrently")
+    if conflicts:
         raise HTTPException(status_code=400, detail="Time slot already booked")
 
-    appointment = Appointment(
-        user_id=current_user.id,
-        doctor_name=payload.doctor_name,
-        appointment_date=payload.appointment_date,
-        reason=payload.reason,
-    )
+    return {"message": "Appointment scheduled successfully", "id": created[0][1]}
 
-    db.add(appointment)
-    await db.commit()
-    await db.refresh(appointment)
 
-    return {"message": "Appointment scheduled successfully", "id": appointment.id}
+@router.post("/bulk")
+async def create_appointments_bulk(
+    payload: List[AppointmentCreate],
+    current_user=Depends(get_authenticated_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Book many appointments at once; slots that overlap are skipped and reported by index"""
+    if not payload:
+        return {"created": [], "conflicts": []}
+    if len(payload) > MAX_BULK_APPOINTMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BULK_APPOINTMENTS} appointments per request",
+        )
+    try:
+        created, conflicts = await book_appointments(db, current_user.id, payload)
+    except BookingConflict:
+        raise HTTPException(status_code=409, detail="Appointments were booked concurrently; retry")
+    return {
+        "created": [{"index": index, "id": apt_id} for index, apt_id in created],
+        "conflicts": [{"index": index, "error": error} for index, error in conflicts],
+    }
 
 
 @router.get("/")
 async def get_appointments(
+    response: Response,
     include_past: bool = False,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user=Depends(get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
+    """Appointments in date order, paged with ``cursor`` / ``X-Next-Cursor``"""
     query = select(Appointment).where(Appointment.user_id == current_user.id)
 
     if not include_past:
         query = query.where(Appointment.appointment_date >= datetime.now(timezone.utc))
 
-    result = await db.execute(query.order_by(Appointment.appointment_date))
-    appointments = result.scalars().all()
+    result = await db.execute(
+        apply_keyset(
+            query, Appointment.appointment_date, Appointment.id, cursor, limit, descending=False
+        )
+    )
+    appointments = finish_page(
+        result.scalars().all(), limit, lambda a: (a.appointment_date, a.id), response
+    )
 
     return [
         {
             "id": apt.id,
             "doctor_name": apt.doctor_name,
             "appointment_date": apt.appointment_date,
+            "duration_minutes": apt.duration_minutes,
+            "end_date": apt.end_date,
             "reason": apt.reason,
             "status": apt.status,
         }
@@ -77,6 +111,30 @@ async def get_appointments(
     ]
 
 
+@router.get("/slots")
+async def find_slots(
+    doctors: List[str] = Query(...),
+    start: Optional[datetime] = None,
+    days: int = Query(30, ge=1, le=90),
+    duration_minutes: int = Query(DEFAULT_DURATION_MINUTES, ge=5, le=MAX_DURATION_MINUTES),
+    limit: int = Query(10, ge=1, le=100),
+    current_user=Depends(get_authenticated_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Earliest free slots with any of ``doctors`` (repeat the parameter), from working hours and bookings"""
+    doctors = list(dict.fromkeys(doctors))
+    if len(doctors) > MAX_SLOT_SEARCH_DOCTORS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_SLOT_SEARCH_DOCTORS} doctors per search"
+        )
+    now = datetime.now(timezone.utc)
+    start = max(as_utc(start), now) if start else now
+    slots = await find_free_slots(
+        db, doctors, start, start + timedelta(days=days), duration_minutes, limit
+    )
+    return {"slots": slots}
+
+
 @router.get("/optimize")
 async def optimize_appointments(
     current_user=Depends(get_authenticated_user),
@@ -10,8 +10,7 @@ import os
 from ..database import get_db
 from ..models.user import User
 from ..utils.security import (
-    verify_password, 
-    get_password_hash, 
+    password_hasher,
     create_access_token,
     create_guest_token,
     get_current_user
@@ -62,7 +61,7 @@ async def register(
     new_user = User(
         username=user.username,
         email=user.email,
-        hashed_password=get_password_hash(user.password)
+        hashed_password=await password_hasher.hash(user.password)
     )
     
     db.add(new_user)
@@ -81,16 +80,35 @@ async def login(
     )
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await password_hasher.verify_and_update(
+            form_data.password, user.hashed_password
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This account has been deactivated"
+        )
+    if new_hash:
+        # The bcrypt cost changed since this password was hashed.
+        user.hashed_password = new_hash
+        await db.commit()
     
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
-        data={"sub": user.username, "user_id": user.id, "is_guest": False},
+        data={
+            "sub": user.username,
+            "user_id": user.id,
+            "is_active": user.is_active,
+            "is_guest": False,
+        },
         expires_delta=access_token_expires
     )
     
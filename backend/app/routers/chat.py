@@ -1,13 +1,22 @@
+import json
+
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
 from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
-from typing import List
+from typing import AsyncIterator, List
 
 from ..database import get_db
 from ..models.health_data import HealthData
-from ..services.gemini_service import GeminiService
+from ..services.gemini_service import GeminiService, StreamInterrupted, get_gemini_service
+from ..services.medicine_checker import (
+    MedicineChecker,
+    get_medicine_checker,
+    summarize_interactions,
+)
+from ..utils.admission import AdmissionRejected
 from ..utils.security import get_current_user
 
 router = APIRouter()
@@ -21,36 +30,83 @@ class MedicineRequest(BaseModel):
     medicines: List[str]
 
 
+async def _recent_health_history(db: AsyncSession, user_id) -> dict:
+    if user_id is None:
+        return {}
+
+    since_date = datetime.now(timezone.utc) - timedelta(days=7)
+    result = await db.execute(
+        select(HealthData)
+        .where(HealthData.user_id == user_id)
+        .where(HealthData.timestamp >= since_date)
+        .order_by(desc(HealthData.timestamp))
+        .limit(5)
+    )
+    recent_data = result.scalars().all()
+
+    if not recent_data:
+        return {}
+
+    latest = recent_data[0]
+    return {
+        "heart_rate": latest.heart_rate,
+        "blood_pressure": f"{latest.blood_pressure_systolic}/{latest.blood_pressure_diastolic}",
+        "temperature": latest.temperature,
+        "weight": latest.weight,
+    }
+
+
+_SAME_DRUG_MESSAGE = "The medicines listed all refer to the same drug, so there are no pairs to check."
+
+
+async def _medicine_check_chunks(report: dict, gemini: GeminiService) -> AsyncIterator[str]:
+    summary = summarize_interactions(report["interactions"])
+    if summary:
+        yield summary + "\n\n"
+    if report["unknown_pairs"]:
+        async for chunk in gemini.stream_medicine_pairs(report["unknown_pairs"]):
+            yield chunk
+    elif not summary:
+        yield _SAME_DRUG_MESSAGE
+
+
+async def _sse_events(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Frame LLM text chunks as Server-Sent Events, ending with a ``done`` event.
+
+    A stream that fails part-way ends with an ``error`` event instead, so the
+    client knows the text it has is incomplete.
+    """
+    try:
+        async for chunk in chunks:
+            yield f"data: {json.dumps({'text': chunk})}\n\n"
+    except AdmissionRejected as e:
+        # Headers are already sent, so overload is reported in-band.
+        yield f"event: error\ndata: {json.dumps({'detail': str(e), 'retry_after': e.retry_after})}\n\n"
+        return
+    except StreamInterrupted:
+        detail = "The AI service stopped responding; the answer above is incomplete."
+        yield f"event: error\ndata: {json.dumps({'detail': detail})}\n\n"
+        return
+    yield f"event: done\ndata: {json.dumps({'timestamp': datetime.now(timezone.utc).isoformat()})}\n\n"
+
+
+def _sse_response(chunks: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        _sse_events(chunks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/symptoms")
 async def analyze_symptoms(
     payload: SymptomRequest,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    gemini: GeminiService = Depends(get_gemini_service),
 ):
-    health_history: dict = {}
-    user_id = current_user.get("id")
-
-    if user_id is not None:
-        since_date = datetime.now(timezone.utc) - timedelta(days=7)
-        result = await db.execute(
-            select(HealthData)
-            .where(HealthData.user_id == user_id)
-            .where(HealthData.timestamp >= since_date)
-            .order_by(desc(HealthData.timestamp))
-            .limit(5)
-        )
-        recent_data = result.scalars().all()
-
-        if recent_data:
-            latest = recent_data[0]
-            health_history = {
-                "heart_rate": latest.heart_rate,
-                "blood_pressure": f"{latest.blood_pressure_systolic}/{latest.blood_pressure_diastolic}",
-                "temperature": latest.temperature,
-                "weight": latest.weight,
-            }
-
-    analysis = await GeminiService().analyze_symptoms(payload.symptoms, health_history)
+    health_history = await _recent_health_history(db, current_user.get("id"))
+    analysis = await gemini.analyze_symptoms(payload.symptoms, health_history)
 
     return {"analysis": analysis, "timestamp": datetime.now(timezone.utc)}
 
@@ -59,14 +115,50 @@ async def analyze_symptoms(
 async def check_medicine_interactions(
     payload: MedicineRequest,
     current_user: dict = Depends(get_current_user),
+    gemini: GeminiService = Depends(get_gemini_service),
+    checker: MedicineChecker = Depends(get_medicine_checker),
 ):
     if len(payload.medicines) < 2:
         return {"message": "Please provide at least 2 medicines to check interactions"}
 
-    interaction_check = await GeminiService().check_medicine_interaction(payload.medicines)
+    # Known pairs are answered from the local dataset; only the rest go to the LLM.
+    report = checker.check(payload.medicines)
+    sections = [summarize_interactions(report["interactions"])]
+    if report["unknown_pairs"]:
+        sections.append(await gemini.check_medicine_pairs(report["unknown_pairs"]))
+    elif not report["interactions"]:
+        sections.append(_SAME_DRUG_MESSAGE)
 
     return {
         "medicines": payload.medicines,
-        "interaction_analysis": interaction_check,
+        "interaction_analysis": "\n\n".join(s for s in sections if s),
+        "known_interactions": report["interactions"],
+        "unknown_pairs": report["unknown_pairs"],
+        "unrecognized": report["unrecognized"],
         "timestamp": datetime.now(timezone.utc),
     }
+
+
+@router.post("/symptoms/stream")
+async def stream_symptom_analysis(
+    payload: SymptomRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    gemini: GeminiService = Depends(get_gemini_service),
+):
+    health_history = await _recent_health_history(db, current_user.get("id"))
+    return _sse_response(gemini.stream_symptoms(payload.symptoms, health_history))
+
+
+@router.post("/medicine-check/stream")
+async def stream_medicine_interactions(
+    payload: MedicineRequest,
+    current_user: dict = Depends(get_current_user),
+    gemini: GeminiService = Depends(get_gemini_service),
+    checker: MedicineChecker = Depends(get_medicine_checker),
+):
+    if len(payload.medicines) < 2:
+        return {"message": "Please provide at least 2 medicines to check interactions"}
+
+    report = checker.check(payload.medicines)
+    return _sse_response(_medicine_check_chunks(report, gemini))
@@ -1,23 +1,31 @@
-import asyncio
-from fastapi import APIRouter, Depends, HTTPException, Query
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from typing import List, Optional
+from sqlalchemy import select, insert
+from sqlalchemy.exc import SQLAlchemyError
+from typing import List, Literal, Optional
 from datetime import datetime, timedelta, timezone
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError, field_validator
 
-from ..database import get_db
+from ..config import get_settings
+from ..database import get_db, get_read_db
 from ..models.health_data import HealthData, MedicineRecord
-from ..services.prediction_service import PredictionService
+from ..services.guest_store import GuestStore, get_guest_store, medicine_key, reading_key
+from ..services.medicine_index import MedicineIndex, get_medicine_index
+from ..services.prediction_service import PredictionService, get_prediction_service
+from ..services import export, rollups, trend_stats
+from ..utils.json_stream import JSONStreamError, iter_json_records
+from ..utils.pagination import apply_keyset, decode_cursor, finish_page
 from ..utils.security import get_current_user, get_authenticated_user
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
+settings = get_settings()
 
-# In-memory storage for guest data (use Redis in production)
-guest_health_data: dict = {}
-guest_medicine_data: dict = {}
-_guest_lock = asyncio.Lock()
+router = APIRouter()
 
+# Bulk uploads report at most this many row errors; "failed" still counts all.
+_MAX_REPORTED_ERRORS = 100
 
 class HealthDataCreate(BaseModel):
     heart_rate: Optional[float] = None
@@ -29,6 +37,19 @@ class HealthDataCreate(BaseModel):
     symptoms: Optional[str] = None
 
 
+class HealthReadingIn(HealthDataCreate):
+    """One reading in a bulk upload; the device's own timestamp is required."""
+
+    timestamp: datetime
+
+    @field_validator("timestamp")
+    @classmethod
+    def _assume_utc(cls, value: datetime) -> datetime:
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+
+
 class MedicineCreate(BaseModel):
     medicine_name: str
     dosage: str
@@ -41,27 +62,23 @@ class MedicineCreate(BaseModel):
 async def add_health_data(
     data: HealthDataCreate,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    guest_store: GuestStore = Depends(get_guest_store),
 ):
     # Handle guest users - store in memory
     if current_user.get("is_guest"):
-        guest_id = current_user["username"]
-        async with _guest_lock:
-            bucket = guest_health_data.setdefault(guest_id, [])
-            record_id = len(bucket) + 1
-            bucket.append(
-                {
-                    "id": record_id,
-                    "timestamp": datetime.now(timezone.utc),
-                    **data.model_dump(),
-                }
-            )
+        await guest_store.add_readings(
+            current_user["username"],
+            current_user["expires_at"],
+            [{"timestamp": datetime.now(timezone.utc), **data.model_dump()}],
+        )
         return {"message": "Health data recorded successfully (guest session)"}
     
     # Handle registered users - store in database
     user_id = current_user.get("id")
     health_data = HealthData(
         user_id=user_id,
+        timestamp=datetime.now(timezone.utc),
         heart_rate=data.heart_rate,
         blood_pressure_systolic=data.blood_pressure_systolic,
         blood_pressure_diastolic=data.blood_pressure_diastolic,
@@ -72,41 +89,177 @@ async def add_health_data(
     )
     
     db.add(health_data)
+    reading = {"timestamp": health_data.timestamp, **data.model_dump()}
+    await trend_stats.record_readings(db, user_id, [reading])
+    await rollups.record_readings(db, user_id, [reading])
     await db.commit()
     
     return {"message": "Health data recorded successfully"}
 
 
+class _BulkIngest:
+    """Validates streamed readings and stores them in chunks, collecting per-row errors."""
+
+    def __init__(self, current_user: dict, db: AsyncSession, guest_store: GuestStore):
+        self.current_user = current_user
+        self.db = db
+        self.guest_store = guest_store
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: list = []
+        self._batch: list = []
+        self._indexes: list = []
+
+    def fail(self, index: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < _MAX_REPORTED_ERRORS:
+            self.errors.append({"index": index, "error": error})
+
+    async def add(self, value, error: Optional[str]) -> None:
+        index = self.received
+        self.received += 1
+        if error is not None:
+            self.fail(index, error)
+            return
+        if not isinstance(value, dict):
+            self.fail(index, "Expected a JSON object")
+            return
+        try:
+            reading = HealthReadingIn.model_validate(value)
+        except ValidationError as exc:
+            self.fail(index, "; ".join(
+                f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in exc.errors()
+            ))
+            return
+        self._batch.append(reading.model_dump())
+        self._indexes.append(index)
+        if len(self._batch) >= settings.bulk_ingest_chunk_rows:
+            await self.flush()
+
+    async def flush(self) -> None:
+        batch, indexes = self._batch, self._indexes
+        self._batch, self._indexes = [], []
+        if not batch:
+            return
+
+        if self.current_user.get("is_guest"):
+            await self.guest_store.add_readings(
+                self.current_user["username"], self.current_user["expires_at"], batch
+            )
+            self.inserted += len(batch)
+            return
+
+        user_id = self.current_user.get("id")
+        try:
+            # Core insert on the table: the ORM bulk path costs several times more per row.
+            await self.db.execute(
+                insert(HealthData.__table__), [{"user_id": user_id, **row} for row in batch]
+            )
+            await trend_stats.record_readings(self.db, user_id, batch)
+            await rollups.record_readings(self.db, user_id, batch)
+            await self.db.commit()
+        except SQLAlchemyError:
+            await self.db.rollback()
+            logger.exception("Bulk insert of %d readings failed", len(batch))
+            for index in indexes:
+                self.fail(index, "Could not be stored")
+            return
+        self.inserted += len(batch)
+
+    def summary(self) -> dict:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+@router.post("/health-data/bulk")
+async def add_health_data_bulk(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    guest_store: GuestStore = Depends(get_guest_store),
+):
+    """Ingest many readings from a JSON array or NDJSON body; each needs a timestamp.
+
+    The body is parsed as it streams in and stored in chunks, one
+    transaction per chunk. Invalid rows are skipped and reported by index.
+    """
+    ingest = _BulkIngest(current_user, db, guest_store)
+    try:
+        async for value, error in iter_json_records(
+            request.stream(), settings.bulk_ingest_max_record_bytes
+        ):
+            await ingest.add(value, error)
+    except JSONStreamError as exc:
+        # Rows before the syntax error are still stored; say so alongside the error.
+        await ingest.flush()
+        return JSONResponse(status_code=400, content={"detail": str(exc), **ingest.summary()})
+    await ingest.flush()
+    return ingest.summary()
+
+
 @router.get("/health-data")
 async def get_health_data(
+    response: Response,
     days: int = Query(30, ge=1, le=365),
     limit: int = Query(100, ge=1, le=500),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    offset: int = Query(0, ge=0, deprecated=True),
+    resolution: Literal["raw", "hour", "day"] = "raw",
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db),
+    guest_store: GuestStore = Depends(get_guest_store),
 ):
+    """Raw readings, or hourly/daily rollups (mean per vital plus min/max/last/count).
+
+    Newest first. When more rows exist, pass the ``X-Next-Cursor`` response
+    header back as ``cursor`` for the next page.
+    """
     since_date = datetime.now(timezone.utc) - timedelta(days=days)
 
     # Handle guest users
     if current_user.get("is_guest"):
         guest_id = current_user["username"]
-        records = guest_health_data.get(guest_id, [])
-        filtered = [r for r in records if r["timestamp"] >= since_date]
-        filtered.sort(key=lambda r: r["timestamp"], reverse=True)
-        return filtered[offset : offset + limit]
+        if resolution != "raw":
+            records = await guest_store.readings(guest_id, rollups.bucket_start(since_date, resolution))
+            buckets = rollups.rollup_readings(records, resolution, since_date)
+            if cursor:
+                before = trend_stats.as_utc(decode_cursor(cursor)[0])
+                buckets = [b for b in buckets if b["timestamp"] < before]
+            page = buckets[offset : offset + limit + 1]
+            return finish_page(page, limit, lambda b: (b["timestamp"], 0), response)
+
+        before = None
+        if cursor:
+            seek_ts, seek_id = decode_cursor(cursor)
+            before = (trend_stats.as_utc(seek_ts), seek_id)
+        page = await guest_store.recent_readings(guest_id, since_date, limit + 1, before, offset)
+        return finish_page(page, limit, reading_key, response)
 
     # Handle registered users
     user_id = current_user.get("id")
+    if resolution != "raw":
+        buckets = await rollups.get_rollups(
+            db, user_id, resolution, since_date, limit, cursor, offset
+        )
+        return finish_page(buckets, limit, lambda b: (b["timestamp"], user_id), response)
 
     result = await db.execute(
-        select(HealthData)
-        .where(HealthData.user_id == user_id)
-        .where(HealthData.timestamp >= since_date)
-        .order_by(desc(HealthData.timestamp))
-        .limit(limit)
+        apply_keyset(
+            select(HealthData)
+            .where(HealthData.user_id == user_id)
+            .where(HealthData.timestamp >= since_date),
+            HealthData.timestamp, HealthData.id, cursor, limit,
+        )
         .offset(offset)
     )
-    health_records = result.scalars().all()
+    health_records = finish_page(
+        result.scalars().all(), limit, lambda r: (r.timestamp, r.id), response
+    )
     
     return [
         {
@@ -127,12 +280,14 @@ async def get_health_data(
 @router.get("/health-trends")
 async def get_health_trends(
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
+    prediction_service: PredictionService = Depends(get_prediction_service),
+    guest_store: GuestStore = Depends(get_guest_store),
 ):
     # Handle guest users
     if current_user.get("is_guest"):
-        guest_id = current_user["username"]
-        records = guest_health_data.get(guest_id, [])
+        records = await guest_store.readings(current_user["username"])
         
         if not records:
             return {"message": "No data available for trends", "data": []}
@@ -147,52 +302,26 @@ async def get_health_trends(
             for record in records
         ]
         
-        prediction_service = PredictionService()
         predictions = await prediction_service.predict_health_trends(health_data)
         
         return predictions
     
-    # Handle registered users
-    user_id = current_user.get("id")
-    since_date = datetime.now(timezone.utc) - timedelta(days=30)
-    
-    result = await db.execute(
-        select(HealthData)
-        .where(HealthData.user_id == user_id)
-        .where(HealthData.timestamp >= since_date)
-        .order_by(HealthData.timestamp)
-    )
-    health_records = result.scalars().all()
-    
-    health_data = [
-        {
-            "timestamp": record.timestamp,
-            "heart_rate": record.heart_rate,
-            "blood_pressure_systolic": record.blood_pressure_systolic,
-            "weight": record.weight
-        }
-        for record in health_records
-    ]
-    
-    prediction_service = PredictionService()
-    predictions = await prediction_service.predict_health_trends(health_data)
-    
-    return predictions
+    # Handle registered users - served from incrementally maintained sums
+    return await trend_stats.get_trends(db, current_user.get("id"), read_db)
 
 
 @router.post("/medicines")
 async def add_medicine(
     data: MedicineCreate,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    guest_store: GuestStore = Depends(get_guest_store),
 ):
     # Handle guest users
     if current_user.get("is_guest"):
-        guest_id = current_user["username"]
-        async with _guest_lock:
-            bucket = guest_medicine_data.setdefault(guest_id, [])
-            record_id = len(bucket) + 1
-            bucket.append({"id": record_id, **data.model_dump()})
+        await guest_store.add_medicine(
+            current_user["username"], current_user["expires_at"], data.model_dump()
+        )
         return {"message": "Medicine record added successfully (guest session)"}
     
     # Handle registered users
@@ -214,22 +343,34 @@ async def add_medicine(
 
 @router.get("/medicines")
 async def get_medicines(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db),
+    guest_store: GuestStore = Depends(get_guest_store),
 ):
+    """Medicines by start date, newest first, paged with ``cursor`` / ``X-Next-Cursor``"""
     # Handle guest users
     if current_user.get("is_guest"):
-        guest_id = current_user["username"]
-        return guest_medicine_data.get(guest_id, [])
+        before = None
+        if cursor:
+            seek_ts, seek_id = decode_cursor(cursor)
+            before = (trend_stats.as_utc(seek_ts), seek_id)
+        medicines = await guest_store.recent_medicines(current_user["username"], limit + 1, before)
+        return finish_page(medicines, limit, medicine_key, response)
     
     # Handle registered users
     user_id = current_user.get("id")
     result = await db.execute(
-        select(MedicineRecord)
-        .where(MedicineRecord.user_id == user_id)
-        .order_by(desc(MedicineRecord.start_date))
+        apply_keyset(
+            select(MedicineRecord).where(MedicineRecord.user_id == user_id),
+            MedicineRecord.start_date, MedicineRecord.id, cursor, limit,
+        )
+    )
+    medicines = finish_page(
+        result.scalars().all(), limit, lambda m: (m.start_date, m.id), response
     )
-    medicines = result.scalars().all()
     
     return [
         {
@@ -244,8 +385,38 @@ async def get_medicines(
     ]
 
 
+@router.get("/export")
+async def export_health_record(
+    format: Literal["csv", "ndjson", "parquet"] = "csv",
+    current_user=Depends(get_authenticated_user),
+):
+    """Download every health reading and medicine as one file, streamed as it's read"""
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow on the server")
+    filename = f"health-record-{datetime.now(timezone.utc):%Y%m%d}.{format}"
+    return StreamingResponse(
+        export.export_records(current_user.id, format),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/medicines/suggest")
+async def suggest_medicines(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user),
+    index: MedicineIndex = Depends(get_medicine_index),
+):
+    """Autocomplete medicine names by prefix, tolerating one-character typos"""
+    return {"query": q, "suggestions": index.suggest(q, limit)}
+
+
 @router.delete("/clear-guest-data")
-async def clear_guest_data(current_user: dict = Depends(get_current_user)):
+async def clear_guest_data(
+    current_user: dict = Depends(get_current_user),
+    guest_store: GuestStore = Depends(get_guest_store),
+):
     """Clear all guest data - only for guest users"""
     if not current_user.get("is_guest"):
         raise HTTPException(
@@ -253,10 +424,6 @@ async def clear_guest_data(current_user: dict = Depends(get_current_user)):
             detail="This endpoint is only for guest users"
         )
     
-    guest_id = current_user["username"]
-
-    async with _guest_lock:
-        guest_health_data.pop(guest_id, None)
-        guest_medicine_data.pop(guest_id, None)
+    await guest_store.clear(current_user["username"])
     
     return {"message": "Guest data cleared successfully"}
\ No newline at end of file
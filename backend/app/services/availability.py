@@ -0,0 +1,205 @@
+"""Free-slot search across doctors.
+
+A doctor's day is a bitmap of 5-minute units: working hours from
+``doctor_schedules`` minus every live appointment with that doctor. Day
+bitmaps are cached per (doctor, date); a booking drops the days it touches,
+and a short TTL covers bookings made by other workers. A search turns each
+doctor's days into a time-ordered stream of slot starts and merges the
+streams with ``heapq.merge``, stopping after the first ``limit`` slots.
+"""
+import heapq
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..models.appointment import MAX_DURATION_MINUTES, Appointment
+from ..models.doctor_schedule import DoctorSchedule
+from .trend_stats import as_utc
+
+settings = get_settings()
+
+UNIT = timedelta(minutes=5)
+UNITS_PER_DAY = timedelta(days=1) // UNIT
+# Slots start on the quarter hour.
+SLOT_STEP = timedelta(minutes=15)
+_ALIGNED = sum(1 << i for i in range(0, UNITS_PER_DAY, SLOT_STEP // UNIT))
+# SQLite hands back naive UTC datetimes, PostgreSQL aware ones.
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
+
+def _span_mask(first: int, last: int) -> int:
+    """Bits ``first`` to ``last - 1``, clipped to the day."""
+    first, last = max(first, 0), min(last, UNITS_PER_DAY)
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+def _units_up(delta: timedelta) -> int:
+    return -(-delta // UNIT)
+
+
+def _run_starts(free: int, units: int) -> int:
+    """Bits at which ``units`` consecutive free bits begin."""
+    runs, span = free, 1
+    while span < units:
+        shift = min(span, units - span)
+        runs &= runs >> shift
+        span += shift
+    return runs
+
+
+def _day_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+class AvailabilityCache:
+    """Free-time bitmaps per (doctor, date), LRU-bounded with a TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, date], tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, date]) -> Optional[int]:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Tuple[str, date], free: int) -> None:
+        self._entries[key] = (free, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, doctor_name: str, start: datetime, end: datetime) -> None:
+        """Drop every day that ``[start, end)`` touches."""
+        day, last = as_utc(start).date(), (as_utc(end) - UNIT).date()
+        while day <= last:
+            self._entries.pop((doctor_name, day), None)
+            day += timedelta(days=1)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+availability_cache = AvailabilityCache(
+    settings.availability_cache_max_entries, settings.availability_cache_ttl_seconds
+)
+
+
+async def _load_days(db: AsyncSession, missing: set) -> dict:
+    """Free bitmaps for (doctor, day) pairs, built with one query per table."""
+    doctors = sorted({doctor for doctor, _ in missing})
+    range_start = _day_start(min(day for _, day in missing))
+    range_end = _day_start(max(day for _, day in missing)) + timedelta(days=1)
+
+    hours: dict = defaultdict(int)
+    result = await db.execute(
+        select(
+            DoctorSchedule.doctor_name, DoctorSchedule.weekday,
+            DoctorSchedule.start_minute, DoctorSchedule.end_minute,
+        ).where(DoctorSchedule.doctor_name.in_(doctors))
+    )
+    for doctor, weekday, start_minute, end_minute in result:
+        hours[(doctor, weekday)] |= _span_mask(
+            _units_up(timedelta(minutes=start_minute)), timedelta(minutes=end_minute) // UNIT
+        )
+
+    # Keyed by (doctor, days since the epoch); unit arithmetic on integers is
+    # several times faster than building per-day datetimes for every booking.
+    booked: dict = defaultdict(int)
+    result = await db.execute(
+        select(Appointment.doctor_name, Appointment.appointment_date, Appointment.end_date)
+        .where(Appointment.doctor_name.in_(doctors))
+        .where(Appointment.status != "cancelled")
+        .where(Appointment.appointment_date > range_start - timedelta(minutes=MAX_DURATION_MINUTES))
+        .where(Appointment.appointment_date < range_end)
+        .where(Appointment.end_date > range_start)
+    )
+    for doctor, start, end in result:
+        epoch = _EPOCH if start.tzinfo else _NAIVE_EPOCH
+        # Partly used units count as busy.
+        first, last = (start - epoch) // UNIT, _units_up(end - epoch)
+        while first < last:
+            day, offset = divmod(first, UNITS_PER_DAY)
+            stop = min(last, (day + 1) * UNITS_PER_DAY)
+            booked[(doctor, day)] |= ((1 << (stop - first)) - 1) << offset
+            first = stop
+
+    days = {}
+    for doctor, day in missing:
+        busy = booked[(doctor, day.toordinal() - _EPOCH_ORDINAL)]
+        free = hours[(doctor, day.weekday())] & ~busy
+        availability_cache.put((doctor, day), free)
+        days[(doctor, day)] = free
+    return days
+
+
+def _doctor_slots(
+    doctor: str, days: List[date], bitmaps: dict, start: datetime, end: datetime, units: int
+) -> Iterator[Tuple[datetime, str]]:
+    for day in days:
+        free = bitmaps[(doctor, day)]
+        if not free:
+            continue
+        day_start = _day_start(day)
+        # Only slots that start at or after ``start`` and end by ``end``.
+        window = _span_mask(_units_up(start - day_start), (end - day_start) // UNIT - units + 1)
+        starts = _run_starts(free, units) & _ALIGNED & window
+        while starts:
+            low = starts & -starts
+            yield day_start + (low.bit_length() - 1) * UNIT, doctor
+            starts ^= low
+
+
+async def find_free_slots(
+    db: AsyncSession,
+    doctors: List[str],
+    start: datetime,
+    end: datetime,
+    duration_minutes: int,
+    limit: int,
+) -> list:
+    """The earliest ``limit`` free slots with any of ``doctors`` inside ``[start, end)``, in time order."""
+    start, end = as_utc(start), as_utc(end)
+    days = [start.date() + timedelta(days=n) for n in range((end.date() - start.date()).days + 1)]
+    bitmaps, missing = {}, set()
+    for doctor in doctors:
+        for day in days:
+            free = availability_cache.get((doctor, day))
+            if free is None:
+                missing.add((doctor, day))
+            else:
+                bitmaps[(doctor, day)] = free
+    if missing:
+        bitmaps.update(await _load_days(db, missing))
+
+    units = _units_up(timedelta(minutes=duration_minutes))
+    merged = heapq.merge(*(_doctor_slots(d, days, bitmaps, start, end, units) for d in doctors))
+    duration = timedelta(minutes=duration_minutes)
+    return [
+        {"doctor_name": doctor, "start": slot, "end": slot + duration}
+        for slot, doctor in islice(merged, limit)
+    ]
@@ -0,0 +1,199 @@
+"""Nightly trend fits for every user, written to ``trend_results``.
+
+``health_data`` is read in (user_id, timestamp) order, a page at a time,
+and cut into chunks on user boundaries. Each chunk is packed into a float array and
+fitted for all of its users at once by ``fit_grouped_trends`` in a process
+pool. Only a bounded number of chunks are in flight, so memory stays flat
+however many users there are.
+
+Results are committed chunk by chunk so the job never holds the write lock
+for long (SQLite has one for the whole database). A run with no
+``finished_at`` is still being written; readers use ``latest_run``.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+
+import numpy as np
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.health_data import HealthData
+from ..models.trend_results import TrendResult, TrendRun
+from .prediction_service import METRICS, fit_grouped_trends, new_process_pool
+
+logger = logging.getLogger(__name__)
+
+BP_METRIC = "blood_pressure_systolic"
+# Stage 1 hypertension starts at 130 mmHg systolic.
+DEFAULT_BP_THRESHOLD = 130.0
+
+
+def _split_at_last_user(rows: list) -> int:
+    """Index where the last user's rows begin, so a chunk never splits a user."""
+    last_user = rows[-1][0]
+    cut = len(rows)
+    while cut > 0 and rows[cut - 1][0] == last_user:
+        cut -= 1
+    return cut
+
+
+def _pack(rows: list) -> tuple:
+    user_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    values = np.array([[r[i] for r in rows] for i in range(1, len(METRICS) + 1)], dtype=float).T
+    starts = np.flatnonzero(np.diff(user_ids)) + 1
+    starts = np.insert(starts, 0, 0)
+    return user_ids[starts], values, starts
+
+
+def _result_rows(run_id: int, user_ids, fit, bp_threshold: float) -> list:
+    counts, slope, forecast = fit
+    bp = METRICS.index(BP_METRIC)
+    rows = []
+    for g, m in zip(*np.nonzero(counts > 2)):
+        s = float(slope[g, m])
+        next_7_days = forecast[g, m].tolist()
+        rows.append({
+            "run_id": run_id,
+            "user_id": int(user_ids[g]),
+            "metric": METRICS[m],
+            "readings": int(counts[g, m]),
+            "slope": s,
+            "current_trend": "increasing" if s > 0 else "decreasing",
+            "trend_strength": abs(s),
+            "next_7_days": next_7_days,
+            "worsening": bool(m == bp and s > 0 and next_7_days[-1] >= bp_threshold),
+        })
+    return rows
+
+
+async def _user_chunks(db: AsyncSession, since: datetime, chunk_rows: int) -> AsyncIterator[list]:
+    """Readings since ``since`` in chunks of whole users, about ``chunk_rows`` rows each.
+
+    Each page is its own short read (keyset on ``user_id``), so no
+    transaction stays open between chunks while results are written.
+    """
+    columns = (HealthData.user_id, *(getattr(HealthData, m) for m in METRICS))
+    base = (
+        select(*columns)
+        .where(HealthData.timestamp >= since)
+        .order_by(HealthData.user_id, HealthData.timestamp, HealthData.id)
+    )
+    after = None
+    while True:
+        page = base.where(HealthData.user_id.isnot(None) if after is None else HealthData.user_id > after)
+        rows = (await db.execute(page.limit(chunk_rows))).all()
+        await db.commit()
+        if len(rows) < chunk_rows:
+            if rows:
+                yield rows
+            return
+        cut = _split_at_last_user(rows)
+        if cut == 0:
+            # One user has more rows than a chunk; take all of theirs.
+            rows = (await db.execute(base.where(HealthData.user_id == rows[0][0]))).all()
+            await db.commit()
+            cut = len(rows)
+        after = rows[cut - 1][0]
+        yield rows[:cut]
+
+
+async def latest_run(db: AsyncSession) -> Optional[TrendRun]:
+    """The newest finished run, or ``None``. Unfinished runs may be partial."""
+    result = await db.execute(
+        select(TrendRun)
+        .where(TrendRun.finished_at.isnot(None))
+        .order_by(TrendRun.id.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def _delete_run(db: AsyncSession, run_id: int) -> None:
+    await db.execute(delete(TrendResult).where(TrendResult.run_id == run_id))
+    await db.execute(delete(TrendRun).where(TrendRun.id == run_id))
+    await db.commit()
+
+
+async def run_cohort_trends(
+    db: AsyncSession,
+    days: int = 30,
+    chunk_rows: int = 50_000,
+    workers: int = 0,
+    bp_threshold: float = DEFAULT_BP_THRESHOLD,
+    keep_runs: int = 7,
+) -> TrendRun:
+    """Fit every user's trends over the last ``days`` days and store them as a new run.
+
+    The run row is committed first and each chunk's results in their own
+    short transaction; ``finished_at`` is set last, so readers that only
+    look at finished runs never see a partial one. A run that fails is
+    deleted. Finished runs beyond the newest ``keep_runs`` are deleted.
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    run = TrendRun(window_days=days)
+    db.add(run)
+    await db.commit()
+    run_id = run.id
+
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    loop = asyncio.get_running_loop()
+    in_flight: deque = deque()
+    users = flagged = 0
+
+    async def drain_one() -> None:
+        nonlocal users, flagged
+        user_ids, future = in_flight.popleft()
+        results = _result_rows(run_id, user_ids, await future, bp_threshold)
+        users += len(user_ids)
+        flagged += sum(r["worsening"] for r in results)
+        if results:
+            await db.execute(insert(TrendResult), results)
+            await db.commit()
+
+    def submit(rows: list) -> None:
+        user_ids, values, starts = _pack(rows)
+        in_flight.append((user_ids, loop.run_in_executor(pool, fit_grouped_trends, values, starts)))
+
+    pool = new_process_pool(workers)
+    try:
+        async for rows in _user_chunks(db, since, chunk_rows):
+            submit(rows)
+            while len(in_flight) >= workers * 2:
+                await drain_one()
+        while in_flight:
+            await drain_one()
+    except BaseException:
+        await db.rollback()
+        await _delete_run(db, run_id)
+        raise
+    finally:
+        await loop.run_in_executor(None, lambda: pool.shutdown(wait=True, cancel_futures=True))
+
+    await db.execute(
+        update(TrendRun)
+        .where(TrendRun.id == run_id)
+        .values(finished_at=datetime.now(timezone.utc), users=users, flagged=flagged)
+    )
+    await db.commit()
+    if keep_runs > 0:
+        stale = await db.execute(
+            select(TrendRun.id)
+            .where(TrendRun.finished_at.isnot(None))
+            .order_by(TrendRun.id.desc())
+            .offset(keep_runs)
+        )
+        for stale_id in stale.scalars().all():
+            await _delete_run(db, stale_id)
+    await db.refresh(run)
+
+    logger.info(
+        "Cohort trend run %d: %d users, %d flagged in %.1fs",
+        run_id, users, flagged, time.perf_counter() - started,
+    )
+    return run
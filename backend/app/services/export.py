@@ -0,0 +1,183 @@
+"""Streaming export of a user's health readings and medicines.
+
+Rows are read with a server-side cursor in ``yield_per`` batches and each
+batch is encoded and sent before the next is fetched, so memory stays flat
+whatever the size of the history. Both tables share one column layout,
+told apart by ``record_type``.
+"""
+import csv
+import importlib.util
+import io
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import select
+
+from ..database import AsyncSessionLocal
+from ..models.health_data import HealthData, MedicineRecord
+
+BATCH_ROWS = 5000
+
+HEALTH_FIELDS = (
+    "id",
+    "timestamp",
+    "heart_rate",
+    "blood_pressure_systolic",
+    "blood_pressure_diastolic",
+    "temperature",
+    "weight",
+    "blood_sugar",
+    "symptoms",
+)
+MEDICINE_FIELDS = ("id", "medicine_name", "dosage", "frequency", "start_date", "end_date")
+COLUMNS = ("record_type",) + HEALTH_FIELDS + MEDICINE_FIELDS[1:]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+# Padding that puts each table's columns in their place in ``COLUMNS``.
+_HEALTH_PAD = (None,) * (len(MEDICINE_FIELDS) - 1)
+_MEDICINE_PAD = (None,) * (len(HEALTH_FIELDS) - 1)
+
+
+def parquet_available() -> bool:
+    # Parquet export is optional; pyarrow is imported only when it's used.
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    # SQLite hands back naive datetimes; everything is stored in UTC.
+    if value.tzinfo is None:
+        return value.isoformat() + "+00:00"
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def _health_rows(rows, iso: bool) -> list:
+    if iso:
+        return [("health_data", r[0], _iso(r[1])) + tuple(r[2:]) + _HEALTH_PAD for r in rows]
+    return [("health_data",) + tuple(r) + _HEALTH_PAD for r in rows]
+
+
+def _medicine_rows(rows, iso: bool) -> list:
+    if iso:
+        return [
+            ("medicine", r[0]) + _MEDICINE_PAD + (r[1], r[2], r[3], _iso(r[4]), _iso(r[5]))
+            for r in rows
+        ]
+    return [("medicine", r[0]) + _MEDICINE_PAD + tuple(r[1:]) for r in rows]
+
+
+async def _record_batches(user_id: int, iso: bool) -> AsyncIterator[list]:
+    """Yield lists of ``COLUMNS``-ordered tuples, health readings first, then medicines.
+
+    With ``iso`` set, datetimes come out as ISO 8601 strings for the text formats.
+    """
+    health = HealthData.__table__.c
+    medicine = MedicineRecord.__table__.c
+    sources = (
+        (
+            select(*(health[f] for f in HEALTH_FIELDS))
+            .where(health.user_id == user_id)
+            .order_by(health.timestamp, health.id),
+            _health_rows,
+        ),
+        (
+            select(*(medicine[f] for f in MEDICINE_FIELDS))
+            .where(medicine.user_id == user_id)
+            .order_by(medicine.start_date, medicine.id),
+            _medicine_rows,
+        ),
+    )
+    # A session of its own: the request's session is gone once the response starts streaming.
+    async with AsyncSessionLocal() as db:
+        for query, build in sources:
+            result = await db.stream(query.execution_options(yield_per=BATCH_ROWS))
+            async for rows in result.partitions():
+                yield build(rows, iso)
+
+
+async def _csv(user_id: int) -> AsyncIterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    async for batch in _record_batches(user_id, iso=True):
+        writer.writerows(batch)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+async def _ndjson(user_id: int) -> AsyncIterator[bytes]:
+    async for batch in _record_batches(user_id, iso=True):
+        yield "".join([json.dumps(dict(zip(COLUMNS, row))) + "\n" for row in batch]).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that keeps what was written until it is drained."""
+
+    def __init__(self):
+        self._chunks: list = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    float_fields = {"heart_rate", "blood_pressure_systolic", "blood_pressure_diastolic",
+                    "temperature", "weight", "blood_sugar"}
+    time_fields = {"timestamp", "start_date", "end_date"}
+    types = []
+    for column in COLUMNS:
+        if column == "id":
+            types.append(pa.int64())
+        elif column in float_fields:
+            types.append(pa.float64())
+        elif column in time_fields:
+            types.append(pa.timestamp("us", tz="UTC"))
+        else:
+            types.append(pa.string())
+    return pa.schema(list(zip(COLUMNS, types)))
+
+
+async def _parquet(user_id: int) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        # One row group per batch; each is flushed to the client as soon as it's written.
+        async for batch in _record_batches(user_id, iso=False):
+            columns = dict(zip(COLUMNS, zip(*batch)))
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+WRITERS = {"csv": _csv, "ndjson": _ndjson, "parquet": _parquet}
+
+
+def export_records(user_id: int, fmt: str) -> AsyncIterator[bytes]:
+    return WRITERS[fmt](user_id)
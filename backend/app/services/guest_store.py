@@ -0,0 +1,297 @@
+"""Guest session data, kept for the life of the guest's token.
+
+``GuestStore`` is the interface the routers use; ``GUEST_STORE_BACKEND``
+picks the implementation. ``memory`` (the default) keeps data in this
+process and suits a single worker. ``redis`` (``redis_guest_store``) shares
+guest sessions across workers and hosts.
+
+In memory, each guest's readings and medicines are time-ordered deques capped at a
+per-guest record count; a record past the cap pushes out the oldest one.
+Ranges are found by bisection, so reads never sort. A global byte budget
+evicts the least recently used guests, and a background sweeper drops
+guests whose token has expired. Nothing here awaits while it mutates, so
+calls are atomic on the event loop without a lock.
+"""
+import asyncio
+import logging
+import sys
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from datetime import datetime
+from itertools import chain, islice
+from typing import Callable, Optional, Tuple
+
+from fastapi import Request
+
+from ..config import get_settings
+from ..utils.pagination import KeyView
+from .trend_stats import as_utc
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def reading_key(record: dict) -> tuple:
+    return (record["timestamp"], record["id"])
+
+
+def medicine_key(record: dict) -> tuple:
+    return (as_utc(record["start_date"]), record["id"])
+
+
+def _size(record: dict) -> int:
+    # Keys are shared interned strings; count the dict and its values.
+    return sys.getsizeof(record) + sum(sys.getsizeof(v) for v in record.values())
+
+
+class GuestStore(ABC):
+    """Per-guest readings and medicines, each ordered by ``reading_key`` / ``medicine_key``.
+
+    Writes take the token's expiry (epoch seconds); a guest's data is gone
+    once it passes. Ids are assigned by the store, per guest and series.
+    """
+
+    async def start(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+    @abstractmethod
+    async def add_readings(self, guest_id: str, expires_at: float, readings: list) -> None:
+        """Store readings (dicts with a UTC ``timestamp``)."""
+
+    @abstractmethod
+    async def add_medicine(self, guest_id: str, expires_at: float, medicine: dict) -> None:
+        """Store one medicine (a dict with a UTC ``start_date``)."""
+
+    @abstractmethod
+    async def readings(self, guest_id: str, since: Optional[datetime] = None) -> list:
+        """Readings from ``since`` onwards, oldest first."""
+
+    @abstractmethod
+    async def recent_readings(
+        self,
+        guest_id: str,
+        since: datetime,
+        limit: int,
+        before: Optional[Tuple[datetime, int]] = None,
+        skip: int = 0,
+    ) -> list:
+        """Up to ``limit`` readings from ``since`` on and ordered before ``before``, newest first."""
+
+    @abstractmethod
+    async def recent_medicines(
+        self, guest_id: str, limit: int, before: Optional[Tuple[datetime, int]] = None
+    ) -> list:
+        """Up to ``limit`` medicines ordered before ``before``, newest first."""
+
+    @abstractmethod
+    async def clear(self, guest_id: str) -> None:
+        """Drop everything stored for the guest."""
+
+    def stats(self) -> dict:
+        return {}
+
+
+class _Series:
+    """Records kept sorted by ``key`` in a deque of at most ``maxlen`` items."""
+
+    __slots__ = ("items", "key", "bytes", "next_id")
+
+    def __init__(self, maxlen: int, key: Callable):
+        self.items: deque = deque(maxlen=maxlen)
+        self.key = key
+        self.bytes = 0
+        self.next_id = 1
+
+    def add(self, records: list) -> None:
+        if not records:
+            return
+        first_id, self.next_id = self.next_id, self.next_id + len(records)
+        records = [{"id": first_id + i, **record} for i, record in enumerate(records)]
+        items, key = self.items, self.key
+        if len(records) > 1:
+            # Timsort merges the sorted runs in near-linear time; keep the newest maxlen.
+            merged = sorted(chain(items, records), key=key)[-items.maxlen:]
+            items.clear()
+            items.extend(merged)
+            self.bytes = sum(_size(r) for r in items)
+            return
+        record = records[0]
+        position = len(items)
+        if items and key(record) < key(items[-1]):
+            position = bisect_right(KeyView(items, key), key(record))
+        if len(items) == items.maxlen:
+            if position == 0:
+                return  # older than everything kept
+            self.bytes -= _size(items.popleft())
+            position -= 1
+        items.insert(position, record)
+        self.bytes += _size(record)
+
+    def index(self, bound: Optional[tuple]) -> int:
+        """Number of records ordered before ``bound`` (all of them for ``None``)."""
+        if bound is None:
+            return len(self.items)
+        return bisect_left(KeyView(self.items, self.key), bound)
+
+    def oldest_first(self, lo: int) -> list:
+        return list(islice(self.items, lo, None))
+
+    def newest_first(self, lo: int, hi: int, limit: int) -> list:
+        # Walk from the newest end: indexing into the middle of a deque is O(n).
+        n = len(self.items)
+        hi = min(hi, n)
+        if hi <= lo:
+            return []
+        return list(islice(reversed(self.items), n - hi, n - max(lo, hi - limit)))
+
+
+class _Guest:
+    __slots__ = ("readings", "medicines", "expires_at")
+
+    def __init__(self, max_readings: int, max_medicines: int, expires_at: float):
+        self.readings = _Series(max_readings, reading_key)
+        self.medicines = _Series(max_medicines, medicine_key)
+        self.expires_at = expires_at
+
+    @property
+    def bytes(self) -> int:
+        return self.readings.bytes + self.medicines.bytes
+
+
+class MemoryGuestStore(GuestStore):
+    """In-memory guest readings and medicines, bounded per guest and in total."""
+
+    def __init__(self):
+        self.max_readings = settings.guest_max_readings
+        self.max_medicines = settings.guest_max_medicines
+        self.max_bytes = settings.guest_store_max_bytes
+        self.sweep_interval = settings.guest_sweep_interval_seconds
+        self._guests: "OrderedDict[str, _Guest]" = OrderedDict()
+        self._bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        self.evicted = 0
+        self.expired = 0
+
+    async def start(self) -> None:
+        self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def aclose(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            removed = self.sweep()
+            if removed:
+                logger.info("Dropped %d expired guest session(s)", removed)
+
+    def sweep(self) -> int:
+        now = time.time()
+        expired = [gid for gid, guest in self._guests.items() if guest.expires_at <= now]
+        for guest_id in expired:
+            self._drop(guest_id)
+        self.expired += len(expired)
+        return len(expired)
+
+    def _get(self, guest_id: str) -> Optional[_Guest]:
+        guest = self._guests.get(guest_id)
+        if guest is None:
+            return None
+        if guest.expires_at <= time.time():
+            self._drop(guest_id)
+            self.expired += 1
+            return None
+        self._guests.move_to_end(guest_id)
+        return guest
+
+    def _drop(self, guest_id: str) -> None:
+        guest = self._guests.pop(guest_id, None)
+        if guest is not None:
+            self._bytes -= guest.bytes
+
+    def _write(self, guest_id: str, expires_at: float, series: str, records: list) -> None:
+        guest = self._get(guest_id)
+        if guest is None:
+            guest = self._guests[guest_id] = _Guest(self.max_readings, self.max_medicines, expires_at)
+        before = guest.bytes
+        getattr(guest, series).add(records)
+        self._bytes += guest.bytes - before
+        # Evict least recently used guests, never the one writing.
+        while self._bytes > self.max_bytes and len(self._guests) > 1:
+            oldest = next(iter(self._guests))
+            self._drop(oldest)
+            self.evicted += 1
+
+    async def add_readings(self, guest_id: str, expires_at: float, readings: list) -> None:
+        self._write(guest_id, expires_at, "readings", readings)
+
+    async def add_medicine(self, guest_id: str, expires_at: float, medicine: dict) -> None:
+        self._write(guest_id, expires_at, "medicines", [medicine])
+
+    async def readings(self, guest_id: str, since: Optional[datetime] = None) -> list:
+        guest = self._get(guest_id)
+        if guest is None:
+            return []
+        series = guest.readings
+        return series.oldest_first(series.index((since,)) if since is not None else 0)
+
+    async def recent_readings(
+        self,
+        guest_id: str,
+        since: datetime,
+        limit: int,
+        before: Optional[Tuple[datetime, int]] = None,
+        skip: int = 0,
+    ) -> list:
+        guest = self._get(guest_id)
+        if guest is None:
+            return []
+        series = guest.readings
+        return series.newest_first(series.index((since,)), series.index(before) - skip, limit)
+
+    async def recent_medicines(
+        self, guest_id: str, limit: int, before: Optional[Tuple[datetime, int]] = None
+    ) -> list:
+        guest = self._get(guest_id)
+        if guest is None:
+            return []
+        series = guest.medicines
+        return series.newest_first(0, series.index(before), limit)
+
+    async def clear(self, guest_id: str) -> None:
+        self._drop(guest_id)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "guests": len(self._guests),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
+
+
+def create_guest_store() -> GuestStore:
+    if settings.guest_store_backend == "redis":
+        from .redis_guest_store import RedisGuestStore
+
+        return RedisGuestStore(settings.redis_url)
+    if settings.guest_store_backend != "memory":
+        raise ValueError(f"Unknown GUEST_STORE_BACKEND {settings.guest_store_backend!r}")
+    return MemoryGuestStore()
+
+
+def get_guest_store(request: Request) -> GuestStore:
+    return request.app.state.guest_store
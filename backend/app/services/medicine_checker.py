@@ -0,0 +1,115 @@
+import json
+import re
+from functools import lru_cache
+from itertools import combinations
+from pathlib import Path
+from typing import Optional
+
+_DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "drug_interactions.json"
+
+# "Ibuprofen 200 mg" and "ibuprofen" are the same drug for interaction purposes.
+_DOSE_RE = re.compile(r"\b\d+(?:\.\d+)?\s*(?:mg|mcg|µg|g|ml|iu|units?)\b")
+
+_SEVERITY_ORDER = {"contraindicated": 0, "major": 1, "moderate": 2, "minor": 3, "none": 4}
+
+
+def normalize_drug_name(name: str) -> str:
+    name = _DOSE_RE.sub(" ", (name or "").casefold())
+    return " ".join(name.replace("_", " ").split())
+
+
+class MedicineChecker:
+    """In-memory drug interaction graph loaded from the bundled dataset.
+
+    Every drug name and synonym maps to a canonical name, and interactions are
+    stored as an adjacency dict keyed by canonical name, so checking an n-drug
+    list is n name lookups plus n*(n-1)/2 dict lookups.
+    """
+
+    def __init__(self, path: Path = _DATA_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        self._canonical: dict = {}
+        for drug, synonyms in data["drugs"].items():
+            canonical = normalize_drug_name(drug)
+            self._canonical[canonical] = canonical
+            for synonym in synonyms:
+                self._canonical[normalize_drug_name(synonym)] = canonical
+
+        self._graph: dict = {}
+        for entry in data["interactions"]:
+            a, b = (self._canonical[normalize_drug_name(d)] for d in entry["drugs"])
+            info = {
+                "severity": entry["severity"],
+                "description": entry["description"],
+                "recommendation": entry.get("recommendation", ""),
+            }
+            self._graph.setdefault(a, {})[b] = info
+            self._graph.setdefault(b, {})[a] = info
+
+    @property
+    def names(self) -> list:
+        """Every recognised drug name and synonym."""
+        return list(self._canonical)
+
+    def resolve(self, name: str) -> Optional[str]:
+        return self._canonical.get(normalize_drug_name(name))
+
+    def check(self, medicines: list) -> dict:
+        """Split all pairs of ``medicines`` into known interactions and unknown pairs.
+
+        A pair is known when the dataset has an entry for it (including
+        explicit "none" entries). Every other pair, including pairs with a
+        drug the dataset doesn't recognise, is returned as unknown.
+        """
+        resolved: dict = {}
+        unrecognized = []
+        for medicine in medicines:
+            label = normalize_drug_name(medicine)
+            if not label:
+                continue
+            canonical = self._canonical.get(label)
+            if canonical is None:
+                unrecognized.append(label)
+                canonical = label
+            resolved.setdefault(canonical, label)
+
+        interactions = []
+        unknown_pairs = []
+        for a, b in combinations(sorted(resolved), 2):
+            info = self._graph.get(a, {}).get(b)
+            if info is None:
+                unknown_pairs.append([a, b])
+            else:
+                interactions.append({"medicines": [a, b], **info})
+
+        interactions.sort(key=lambda i: _SEVERITY_ORDER.get(i["severity"], len(_SEVERITY_ORDER)))
+        return {
+            "resolved": resolved,
+            "interactions": interactions,
+            "unknown_pairs": unknown_pairs,
+            "unrecognized": sorted(set(unrecognized)),
+        }
+
+
+def summarize_interactions(interactions: list) -> str:
+    """Plain-text rendering of known interactions for the chat UI."""
+    if not interactions:
+        return ""
+    lines = ["Known interactions (from the bundled interaction database):"]
+    for item in interactions:
+        a, b = item["medicines"]
+        lines.append(
+            f"- {a} + {b}: {item['severity']}. {item['description']} {item['recommendation']}".rstrip()
+        )
+    lines.append(
+        "This information is not a substitute for advice from a pharmacist or "
+        "healthcare professional."
+    )
+    return "\n".join(lines)
+
+
+@lru_cache()
+def get_medicine_checker() -> MedicineChecker:
+    return MedicineChecker()
@@ -0,0 +1,123 @@
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .medicine_checker import get_medicine_checker, normalize_drug_name
+
+_VOCABULARY_PATH = Path(__file__).resolve().parent.parent / "data" / "drug_vocabulary.txt"
+
+# Typo lookup also covers short prefixes so half-typed names ("ibpu",
+# "metfro") still find their drug before the user finishes typing.
+_MIN_FUZZY_LEN = 4
+_FUZZY_PREFIX_LEN = 6
+
+
+def _deletes(word: str) -> set:
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if ``a`` and ``b`` differ by at most one insert, delete, substitution or swap."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    i = 0
+    while i < min(la, lb) and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        if a[i + 1:] == b[i + 1:]:
+            return True
+        return a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+    if la > lb:
+        return a[i + 1:] == b[i:]
+    return a[i:] == b[i + 1:]
+
+
+class MedicineIndex:
+    """Prefix and typo-tolerant lookup over medicine names.
+
+    Prefix queries bisect a sorted list of normalized names. When that finds
+    too little, a symmetric-delete index (every name and its short prefix,
+    each with one character removed) yields candidates within one edit of the
+    query without scanning the vocabulary.
+    """
+
+    def __init__(self, names: Iterable[str], generics: Optional[dict] = None):
+        generics = generics or {}
+        self._generic: dict = {}
+        for name in names:
+            key = normalize_drug_name(name)
+            if key:
+                self._generic.setdefault(key, generics.get(key, key))
+        self._keys = sorted(self._generic)
+
+        self._fuzzy: dict = {}
+        for idx, key in enumerate(self._keys):
+            variants = {key} | _deletes(key)
+            for length in range(_MIN_FUZZY_LEN, _FUZZY_PREFIX_LEN + 1):
+                prefix = key[:length]
+                variants.add(prefix)
+                variants.update(_deletes(prefix))
+            for variant in variants:
+                self._fuzzy.setdefault(variant, []).append(idx)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _entry(self, key: str) -> dict:
+        return {"name": key, "generic": self._generic[key]}
+
+    def suggest(self, query: str, limit: int = 10) -> list:
+        q = normalize_drug_name(query)
+        if not q:
+            return []
+
+        start = bisect_left(self._keys, q)
+        matches = []
+        for key in self._keys[start:start + limit]:
+            if not key.startswith(q):
+                break
+            matches.append(key)
+
+        if len(matches) < limit and len(q) >= _MIN_FUZZY_LEN:
+            seen = set(matches)
+            for key in self._typo_matches(q):
+                if key not in seen:
+                    seen.add(key)
+                    matches.append(key)
+                    if len(matches) >= limit:
+                        break
+
+        return [self._entry(key) for key in matches]
+
+    def _typo_matches(self, q: str) -> list:
+        probe = q[:_FUZZY_PREFIX_LEN] if len(q) >= _FUZZY_PREFIX_LEN else q
+        candidates = set()
+        for variant in {probe} | _deletes(probe):
+            candidates.update(self._fuzzy.get(variant, ()))
+
+        found = []
+        for idx in candidates:
+            key = self._keys[idx]
+            # Full-word typo ("ibuprofin") or typo while still typing ("ibpu").
+            if _within_one_edit(q, key) or any(
+                _within_one_edit(probe, key[:len(probe) + d]) for d in (-1, 0, 1)
+            ):
+                found.append((not _within_one_edit(q, key), abs(len(key) - len(q)), key))
+        return [key for *_, key in sorted(found)]
+
+
+def _load_vocabulary(path: Path = _VOCABULARY_PATH) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+@lru_cache()
+def get_medicine_index() -> MedicineIndex:
+    checker = get_medicine_checker()
+    names = _load_vocabulary() + checker.names
+    generics = {normalize_drug_name(n): checker.resolve(n) for n in checker.names}
+    return MedicineIndex(names, generics)
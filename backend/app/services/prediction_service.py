@@ -1,44 +1,266 @@
-import numpy as np
-from sklearn.linear_model import LinearRegression
-from datetime import datetime, timedelta
-import pandas as pd
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Optional
+
+from fastapi import Request
+
+from ..config import get_settings
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# numpy is imported inside the functions that use it, so importing the app
+# (every worker boot and --reload) doesn't pay for it until a trend is fitted.
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("heart_rate", "blood_pressure_systolic", "weight")
+FORECAST_DAYS = 7
+
+
+def fit_trend_sums(values: "np.ndarray") -> tuple:
+    """Least-squares sufficient statistics for every column of ``values`` at once.
+
+    ``values`` is an (n_rows, n_metrics) array with NaN for missing readings;
+    x is the row index. Returns per-column arrays (n, Σx, Σy, Σx², Σxy) over
+    the non-NaN entries only.
+    """
+    import numpy as np
+
+    mask = ~np.isnan(values)
+    present = mask.astype(float)
+    y = np.where(mask, values, 0.0)
+    x = np.arange(values.shape[0], dtype=float)
+    return (
+        mask.sum(axis=0),
+        x @ present,
+        y.sum(axis=0),
+        (x * x) @ present,
+        x @ y,
+    )
+
+
+def trend_from_sums(n, sx, sy, sxx, sxy, n_rows: int) -> dict:
+    """Closed-form regression line from its sums, projected ``FORECAST_DAYS`` rows ahead."""
+    import numpy as np
+
+    denom = n * sxx - sx * sx
+    slope = (n * sxy - sx * sy) / denom if denom else 0.0
+    intercept = (sy - slope * sx) / n
+    future = np.arange(n_rows, n_rows + FORECAST_DAYS, dtype=float)
+    return {
+        "current_trend": "increasing" if slope > 0 else "decreasing",
+        "next_7_days": (intercept + slope * future).tolist(),
+        "trend_strength": abs(float(slope)),
+    }
+
+
+def fit_grouped_trends(values: "np.ndarray", starts: "np.ndarray") -> tuple:
+    """Trend fits for many users at once.
+
+    ``values`` holds every user's rows back to back, each user's in
+    timestamp order, and ``starts`` is the index of each user's first row.
+    x restarts at 0 for every user, so each group gets exactly the fit
+    ``predict_trends`` would give it. Returns (counts, slope, next_7_days)
+    with shapes (groups, metrics) and (groups, metrics, FORECAST_DAYS);
+    fits with fewer than 3 readings should be ignored.
+    """
+    import numpy as np
+
+    n_rows = values.shape[0]
+    sizes = np.diff(np.append(starts, n_rows))
+    x = (np.arange(n_rows) - np.repeat(starts, sizes)).astype(float)[:, None]
+    mask = ~np.isnan(values)
+    present = mask.astype(float)
+    y = np.where(mask, values, 0.0)
+
+    n = np.add.reduceat(present, starts, axis=0)
+    sx = np.add.reduceat(x * present, starts, axis=0)
+    sy = np.add.reduceat(y, starts, axis=0)
+    sxx = np.add.reduceat(x * x * present, starts, axis=0)
+    sxy = np.add.reduceat(x * y, starts, axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denom = n * sxx - sx * sx
+        slope = np.where(denom != 0, (n * sxy - sx * sy) / denom, 0.0)
+        intercept = (sy - slope * sx) / n
+    future = sizes[:, None] + np.arange(FORECAST_DAYS)
+    forecast = intercept[:, :, None] + slope[:, :, None] * future[:, None, :]
+    return n.astype(int), slope, forecast
+
+
+def trend_matrix(health_data: list) -> "np.ndarray":
+    """(n_rows, n_metrics) float array of ``METRICS`` in timestamp order, NaN where missing."""
+    import numpy as np
+
+    rows = sorted(health_data, key=lambda r: r["timestamp"])
+    # Column-wise conversion is roughly twice as fast as building row lists.
+    return np.array([[r.get(m) for r in rows] for m in METRICS], dtype=float).T
+
+
+def predict_from_matrix(values: "np.ndarray") -> dict:
+    counts, sx, sy, sxx, sxy = fit_trend_sums(values)
+    predictions = {}
+    for i, metric in enumerate(METRICS):
+        if counts[i] > 2:
+            predictions[metric] = trend_from_sums(
+                counts[i], sx[i], sy[i], sxx[i], sxy[i], n_rows=values.shape[0]
+            )
+    return predictions
+
+
+def predict_trends(health_data: list) -> dict:
+    """Fit a linear trend per metric over readings ordered by timestamp."""
+    if len(health_data) < 3:
+        return {"error": "Insufficient data for prediction"}
+    return predict_from_matrix(trend_matrix(health_data))
+
+
+def estimate_trends(health_data: list, max_rows: int) -> dict:
+    """Cheaper stand-in for ``predict_trends`` that fits only the last ``max_rows`` readings.
+
+    Readings are taken in list order, which for append-only histories is
+    time order, so this never touches more than ``max_rows`` rows.
+    """
+    return predict_trends(health_data[-max_rows:])
+
+
+def warm_up() -> None:
+    """Import numpy and run one tiny fit, so the first real fit doesn't pay for either."""
+    predict_trends([{"timestamp": i, "heart_rate": float(i)} for i in range(3)])
+
+
+def _warm_worker() -> None:
+    # Runs once per worker process, keeping the import and first-call setup
+    # off the request path.
+    warm_up()
+
+
+def _ping() -> bool:
+    return True
+
+
+def new_process_pool(workers: int) -> ProcessPoolExecutor:
+    # spawn, not fork: the parent has event loop, DB and LLM client threads.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_worker,
+    )
+
 
 class PredictionService:
+    """Runs trend fits in a bounded process pool so large histories don't block the event loop.
+
+    Small inputs are fitted inline, where shipping them to a worker would
+    cost more than the fit. Larger ones are packed into a float array on a
+    thread (pickling the reading dicts themselves holds the GIL for longer
+    than the fit takes) and the array is fitted in a worker. When every
+    worker is busy and the backlog is full, or a fit misses its deadline,
+    the caller gets ``estimate_trends`` instead of waiting.
+    """
+
     def __init__(self):
-        self.models = {}
-    
+        settings = get_settings()
+        self._workers = settings.trend_pool_workers
+        self._max_pending = settings.trend_pool_max_pending
+        self._timeout = settings.trend_timeout_seconds
+        self._inline_max_rows = settings.trend_inline_max_rows
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self.completed = 0
+        self.inline = 0
+        self.estimated = 0
+        self.timed_out = 0
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return new_process_pool(self._workers)
+
+    async def start(self) -> None:
+        """Create the pool; its worker processes start with the first fit or ``warm_up``."""
+        if self._workers > 0:
+            self._pool = self._new_pool()
+
+    async def warm_up(self) -> None:
+        """Load numpy here and start every worker, so no request waits for either."""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        await loop.run_in_executor(None, warm_up)
+        if self._pool is not None:
+            await asyncio.gather(
+                *(loop.run_in_executor(self._pool, _ping) for _ in range(self._workers))
+            )
+        logger.info(
+            "Trend prediction warmed up: %d workers in %.2fs",
+            self._workers if self._pool is not None else 0, time.perf_counter() - started,
+        )
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: pool.shutdown(wait=True, cancel_futures=True)
+            )
+
+    def _release(self, _future) -> None:
+        self._pending -= 1
+
+    def _estimate(self, health_data: list) -> dict:
+        self.estimated += 1
+        return estimate_trends(health_data, self._inline_max_rows)
+
     async def predict_health_trends(self, health_data: list):
-        if len(health_data) < 3:
-            return {"error": "Insufficient data for prediction"}
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(health_data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
-        
-        # Create time index
-        df['time_index'] = range(len(df))
-        
-        predictions = {}
-        metrics = ['heart_rate', 'blood_pressure_systolic', 'weight']
-        
-        for metric in metrics:
-            if metric in df.columns and df[metric].notna().sum() > 2:
-                # Simple linear regression
-                X = df['time_index'].values.reshape(-1, 1)
-                y = df[metric].ffill().values
-                
-                model = LinearRegression()
-                model.fit(X, y)
-                
-                # Predict next 7 days
-                future_indices = np.array(range(len(df), len(df) + 7)).reshape(-1, 1)
-                future_predictions = model.predict(future_indices)
-                
-                predictions[metric] = {
-                    'current_trend': 'increasing' if model.coef_[0] > 0 else 'decreasing',
-                    'next_7_days': future_predictions.tolist(),
-                    'trend_strength': abs(model.coef_[0])
-                }
-        
-        return predictions
\ No newline at end of file
+        if self._pool is None or len(health_data) <= self._inline_max_rows:
+            self.inline += 1
+            return predict_trends(health_data)
+
+        if self._pending >= self._max_pending:
+            logger.warning("Trend prediction pool saturated; returning an estimate")
+            return self._estimate(health_data)
+
+        # The slot stays taken until the worker actually finishes, even if we
+        # stop waiting for it, so saturation reflects real pool load.
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        try:
+            values = await loop.run_in_executor(None, trend_matrix, health_data)
+            future = loop.run_in_executor(self._pool, predict_from_matrix, values)
+        except BrokenProcessPool:
+            self._pending -= 1
+            logger.exception("Trend prediction pool is broken; restarting it")
+            self._pool = self._new_pool()
+            return self._estimate(health_data)
+        except BaseException:
+            self._pending -= 1
+            raise
+        future.add_done_callback(self._release)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), self._timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning("Trend prediction timed out after %.1fs; returning an estimate", self._timeout)
+            return self._estimate(health_data)
+        except BrokenProcessPool:
+            logger.exception("Trend prediction worker died; restarting the pool")
+            self._pool = self._new_pool()
+            return self._estimate(health_data)
+        self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self._workers if self._pool is not None else 0,
+            "pending": self._pending,
+            "completed": self.completed,
+            "inline": self.inline,
+            "estimated": self.estimated,
+            "timed_out": self.timed_out,
+        }
+
+
+def get_prediction_service(request: Request) -> PredictionService:
+    return request.app.state.prediction_service
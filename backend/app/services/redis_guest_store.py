@@ -0,0 +1,141 @@
+"""Guest store on Redis, shared by every worker and host.
+
+Each guest has two sorted sets, ``guest:{id}:readings`` and
+``guest:{id}:medicines``, scored by timestamp in microseconds. Members are
+``<zero-padded id>|<json>``: Redis orders equal scores by member, so the sets
+are in (timestamp, id) order and pages are plain range queries. A write is
+one pipeline that adds, trims to the per-guest cap and sets every key to
+expire with the guest's token. Redis's ``maxmemory`` policy takes the place
+of the in-memory store's byte budget.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+import redis.asyncio as redis
+
+from ..config import get_settings
+from .guest_store import GuestStore
+from .trend_stats import as_utc
+
+settings = get_settings()
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ID_WIDTH = 12
+_DATETIME_FIELDS = {
+    "readings": ("timestamp",),
+    "medicines": ("start_date", "end_date"),
+}
+
+
+def _score(value: datetime) -> int:
+    # Exact integer microseconds; a float timestamp would round.
+    return (as_utc(value) - _EPOCH) // timedelta(microseconds=1)
+
+
+def _member(record: dict) -> str:
+    return f"{record['id']:0{_ID_WIDTH}d}|{json.dumps(record, default=datetime.isoformat)}"
+
+
+def _member_id(member: str) -> int:
+    return int(member[:_ID_WIDTH])
+
+
+def _decode(member: str, series: str) -> dict:
+    record = json.loads(member[_ID_WIDTH + 1:])
+    for field in _DATETIME_FIELDS[series]:
+        if record.get(field) is not None:
+            record[field] = datetime.fromisoformat(record[field])
+    return record
+
+
+class RedisGuestStore(GuestStore):
+    def __init__(self, url: str):
+        self._redis = redis.from_url(url, decode_responses=True)
+        self.max_records = {
+            "readings": settings.guest_max_readings,
+            "medicines": settings.guest_max_medicines,
+        }
+
+    async def start(self) -> None:
+        # Fail at startup, not on the first guest request, if Redis is unreachable.
+        await self._redis.ping()
+
+    async def aclose(self) -> None:
+        await self._redis.aclose()
+
+    @staticmethod
+    def _key(guest_id: str, series: str) -> str:
+        return f"guest:{guest_id}:{series}"
+
+    async def _write(self, guest_id: str, expires_at: float, series: str, records: list) -> None:
+        if not records:
+            return
+        ids_key = self._key(guest_id, "ids")
+        last_id = await self._redis.hincrby(ids_key, series, len(records))
+        first_id = last_id - len(records) + 1
+        score_field = _DATETIME_FIELDS[series][0]
+        members = {}
+        for i, record in enumerate(records):
+            record = {"id": first_id + i, **record}
+            members[_member(record)] = _score(record[score_field])
+
+        key = self._key(guest_id, series)
+        expire_at = int(expires_at) + 1
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(key, members)
+            # Keep the newest max_records, like the in-memory deques.
+            pipe.zremrangebyrank(key, 0, -self.max_records[series] - 1)
+            pipe.expireat(key, expire_at)
+            pipe.expireat(ids_key, expire_at)
+            await pipe.execute()
+
+    async def add_readings(self, guest_id: str, expires_at: float, readings: list) -> None:
+        await self._write(guest_id, expires_at, "readings", readings)
+
+    async def add_medicine(self, guest_id: str, expires_at: float, medicine: dict) -> None:
+        await self._write(guest_id, expires_at, "medicines", [medicine])
+
+    async def readings(self, guest_id: str, since: Optional[datetime] = None) -> list:
+        low = _score(since) if since is not None else "-inf"
+        members = await self._redis.zrangebyscore(self._key(guest_id, "readings"), low, "+inf")
+        return [_decode(m, "readings") for m in members]
+
+    async def _newest_first(
+        self, key: str, low, limit: int, before: Optional[Tuple[datetime, int]], skip: int
+    ) -> list:
+        high = "+inf"
+        if before is not None:
+            high = _score(before[0])
+            # Members at the cursor's own timestamp with an id >= its id come
+            # first in reverse order; skip past them.
+            at_bound = await self._redis.zrangebyscore(key, high, high)
+            skip += sum(1 for m in at_bound if _member_id(m) >= before[1])
+        return await self._redis.zrevrangebyscore(key, high, low, start=skip, num=limit)
+
+    async def recent_readings(
+        self,
+        guest_id: str,
+        since: datetime,
+        limit: int,
+        before: Optional[Tuple[datetime, int]] = None,
+        skip: int = 0,
+    ) -> list:
+        key = self._key(guest_id, "readings")
+        members = await self._newest_first(key, _score(since), limit, before, skip)
+        return [_decode(m, "readings") for m in members]
+
+    async def recent_medicines(
+        self, guest_id: str, limit: int, before: Optional[Tuple[datetime, int]] = None
+    ) -> list:
+        key = self._key(guest_id, "medicines")
+        members = await self._newest_first(key, "-inf", limit, before, 0)
+        return [_decode(m, "medicines") for m in members]
+
+    async def clear(self, guest_id: str) -> None:
+        await self._redis.delete(
+            *(self._key(guest_id, series) for series in ("readings", "medicines", "ids"))
+        )
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
@@ -0,0 +1,217 @@
+"""Hourly and daily rollups of ``health_data``, maintained as readings arrive.
+
+Long-range charts read one row per bucket from ``health_data_rollups``
+instead of every raw reading in the range.
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, case, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import dialect_insert
+from ..models.health_data import HealthData
+from ..models.rollups import HealthDataRollup
+from ..utils.pagination import apply_keyset
+from .trend_stats import as_utc
+
+RESOLUTIONS = ("hour", "day")
+VITALS = (
+    "heart_rate",
+    "blood_pressure_systolic",
+    "blood_pressure_diastolic",
+    "temperature",
+    "weight",
+    "blood_sugar",
+)
+
+
+def bucket_start(ts: datetime, resolution: str) -> datetime:
+    ts = as_utc(ts)
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# Column names per vital, built once: formatting them per reading dominated bulk ingest.
+_VITAL_FIELDS = tuple(
+    (vital, f"{vital}_count", f"{vital}_min", f"{vital}_max", f"{vital}_sum",
+     f"{vital}_last", f"{vital}_last_at")
+    for vital in VITALS
+)
+_EMPTY_BUCKET = {"count": 0}
+for _vital, _count, _min, _max, _sum, _last, _last_at in _VITAL_FIELDS:
+    _EMPTY_BUCKET.update({_count: 0, _min: None, _max: None, _sum: 0.0, _last: None, _last_at: None})
+
+
+class _Rollups:
+    """Aggregates readings into per-(resolution, bucket_start) rollup rows."""
+
+    def __init__(self, resolutions: Iterable[str] = RESOLUTIONS):
+        self.resolutions = tuple(resolutions)
+        self.buckets: dict = {}
+
+    def add(self, reading: dict) -> None:
+        ts = as_utc(reading["timestamp"])
+        present = [(fields, reading.get(fields[0])) for fields in _VITAL_FIELDS]
+        present = [(fields, y) for fields, y in present if y is not None]
+        hour = ts.replace(minute=0, second=0, microsecond=0)
+        starts = {"hour": hour, "day": hour.replace(hour=0)}
+        for resolution in self.resolutions:
+            key = (resolution, starts[resolution])
+            acc = self.buckets.get(key)
+            if acc is None:
+                acc = self.buckets[key] = dict(_EMPTY_BUCKET, last_timestamp=ts)
+            acc["count"] += 1
+            if ts > acc["last_timestamp"]:
+                acc["last_timestamp"] = ts
+            for (_, count, low, high, total, last, last_at), y in present:
+                acc[count] += 1
+                acc[total] += y
+                if acc[low] is None or y < acc[low]:
+                    acc[low] = y
+                if acc[high] is None or y > acc[high]:
+                    acc[high] = y
+                if acc[last_at] is None or ts >= acc[last_at]:
+                    acc[last] = y
+                    acc[last_at] = ts
+
+    def rows(self, user_id: int) -> list:
+        return [
+            {"user_id": user_id, "resolution": resolution, "bucket_start": start, **acc}
+            for (resolution, start), acc in self.buckets.items()
+        ]
+
+
+# Per dialect: building the statement took longer than the rest of a single-reading write.
+_merge_rollup_stmts: dict = {}
+
+
+def _merge_rollup_stmt(db: AsyncSession):
+    """Upsert that folds a batch's aggregates into an existing rollup row."""
+    dialect = db.bind.dialect.name
+    stmt = _merge_rollup_stmts.get(dialect)
+    if stmt is None:
+        stmt = _merge_rollup_stmts[dialect] = _build_merge_rollup_stmt(db)
+    return stmt
+
+
+def _build_merge_rollup_stmt(db: AsyncSession):
+    stmt = dialect_insert(db, HealthDataRollup)
+    new = stmt.excluded
+    old = HealthDataRollup
+    set_ = {
+        "count": old.count + new.count,
+        "last_timestamp": case(
+            (new.last_timestamp > old.last_timestamp, new.last_timestamp),
+            else_=old.last_timestamp,
+        ),
+    }
+    for vital in VITALS:
+        new_min, old_min = getattr(new, f"{vital}_min"), getattr(old, f"{vital}_min")
+        new_max, old_max = getattr(new, f"{vital}_max"), getattr(old, f"{vital}_max")
+        new_last_at, old_last_at = getattr(new, f"{vital}_last_at"), getattr(old, f"{vital}_last_at")
+        newer = and_(
+            new_last_at.isnot(None), (old_last_at.is_(None)) | (new_last_at >= old_last_at)
+        )
+        # CASE rather than LEAST/GREATEST: SQLite has neither and NULL means "no reading".
+        set_[f"{vital}_min"] = case(
+            (new_min.is_(None), old_min),
+            (old_min.is_(None), new_min),
+            (new_min < old_min, new_min),
+            else_=old_min,
+        )
+        set_[f"{vital}_max"] = case(
+            (new_max.is_(None), old_max),
+            (old_max.is_(None), new_max),
+            (new_max > old_max, new_max),
+            else_=old_max,
+        )
+        set_[f"{vital}_count"] = getattr(old, f"{vital}_count") + getattr(new, f"{vital}_count")
+        set_[f"{vital}_sum"] = getattr(old, f"{vital}_sum") + getattr(new, f"{vital}_sum")
+        set_[f"{vital}_last"] = case(
+            (newer, getattr(new, f"{vital}_last")), else_=getattr(old, f"{vital}_last")
+        )
+        set_[f"{vital}_last_at"] = case((newer, new_last_at), else_=old_last_at)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "resolution", "bucket_start"], set_=set_
+    )
+
+
+async def record_readings(db: AsyncSession, user_id: int, readings: list) -> None:
+    """Fold new readings into the user's rollups inside the caller's transaction."""
+    if not readings:
+        return
+    rollups = _Rollups()
+    for reading in readings:
+        rollups.add(reading)
+    await db.execute(_merge_rollup_stmt(db), rollups.rows(user_id))
+
+
+async def rebuild_rollups(db: AsyncSession, user_id: int, chunk_rows: int = 10_000) -> int:
+    """Recompute a user's rollups from ``health_data`` (caller commits). Returns the row count."""
+    result = await db.stream(
+        select(HealthData.timestamp, *(getattr(HealthData, v) for v in VITALS))
+        .where(HealthData.user_id == user_id)
+        .execution_options(yield_per=chunk_rows)
+    )
+    rollups = _Rollups()
+    async for row in result:
+        rollups.add(row._mapping)
+
+    await db.execute(delete(HealthDataRollup).where(HealthDataRollup.user_id == user_id))
+    rows = rollups.rows(user_id)
+    if rows:
+        await db.execute(dialect_insert(db, HealthDataRollup), rows)
+    return len(rows)
+
+
+def serialize(bucket: dict) -> dict:
+    """API shape of a rollup: each vital's mean under its own name, plus min/max/last/count."""
+    out = {
+        "timestamp": bucket["bucket_start"],
+        "resolution": bucket["resolution"],
+        "count": bucket["count"],
+    }
+    for vital in VITALS:
+        count = bucket[f"{vital}_count"]
+        out[vital] = bucket[f"{vital}_sum"] / count if count else None
+        out[f"{vital}_min"] = bucket[f"{vital}_min"]
+        out[f"{vital}_max"] = bucket[f"{vital}_max"]
+        out[f"{vital}_last"] = bucket[f"{vital}_last"]
+        out[f"{vital}_count"] = count
+    return out
+
+
+async def get_rollups(
+    db: AsyncSession,
+    user_id: int,
+    resolution: str,
+    since: datetime,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+) -> list:
+    """Newest-first rollups; returns up to ``limit + 1`` rows for ``finish_page``."""
+    # bucket_start is unique per (user, resolution); user_id only fills the cursor's id slot.
+    query = apply_keyset(
+        select(HealthDataRollup)
+        .where(HealthDataRollup.user_id == user_id)
+        .where(HealthDataRollup.resolution == resolution)
+        .where(HealthDataRollup.bucket_start >= bucket_start(since, resolution)),
+        HealthDataRollup.bucket_start, HealthDataRollup.user_id, cursor, limit,
+    )
+    result = await db.execute(query.offset(offset))
+    columns = HealthDataRollup.__table__.columns.keys()
+    return [serialize({c: getattr(row, c) for c in columns}) for row in result.scalars()]
+
+
+def rollup_readings(readings: Iterable[dict], resolution: str, since: datetime) -> list:
+    """In-memory rollups for readings that aren't in the database (guest sessions), newest first."""
+    since = bucket_start(since, resolution)
+    rollups = _Rollups((resolution,))
+    for reading in readings:
+        if as_utc(reading["timestamp"]) >= since:
+            rollups.add(reading)
+    rows = sorted(rollups.rows(user_id=0), key=lambda b: b["bucket_start"], reverse=True)
+    return [serialize(row) for row in rows]
@@ -0,0 +1,183 @@
+"""Appointment booking with duration-aware conflict checks.
+
+A booking first locks the user's row, so bookings for one user are
+serialized across workers: a row lock on PostgreSQL, the database write
+lock on SQLite. It then loads the user's live appointments around the
+requested slots in one query, merges them into an ``IntervalIndex`` and
+checks each slot by bisection. On PostgreSQL an exclusion constraint also
+rejects overlaps in the database. The partial unique index on
+(user_id, appointment_date) covers exact double bookings everywhere.
+"""
+import logging
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import bindparam, insert, select, text, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.appointment import DEFAULT_DURATION_MINUTES, MAX_DURATION_MINUTES, Appointment
+from ..models.user import User
+from .availability import availability_cache
+from .trend_stats import as_utc
+
+logger = logging.getLogger(__name__)
+
+_NO_OVERLAP = "ex_appointments_user_no_overlap"
+
+
+class BookingConflict(Exception):
+    """The database rejected a booking the in-memory check let through."""
+
+
+class IntervalIndex:
+    """Busy time as sorted, disjoint ``[start, end)`` intervals.
+
+    Overlapping input intervals are merged, so the ends are sorted too and
+    an overlap test is one bisection.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[datetime, datetime]] = ()):
+        self.starts: list = []
+        self.ends: list = []
+        for start, end in sorted(intervals):
+            if self.ends and start < self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        # The last interval starting before ``end`` is the only candidate.
+        i = bisect_left(self.starts, end)
+        return i > 0 and self.ends[i - 1] > start
+
+    def add(self, start: datetime, end: datetime) -> None:
+        """Insert an interval that doesn't overlap any already present."""
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+
+
+async def _lock_user(db: AsyncSession, user_id: int) -> None:
+    # A no-op UPDATE: a row lock on PostgreSQL, the write lock on SQLite.
+    users = User.__table__
+    await db.execute(update(users).where(users.c.id == user_id).values(id=users.c.id))
+
+
+async def _busy(db: AsyncSession, user_id: int, start: datetime, end: datetime) -> IntervalIndex:
+    """The user's live appointments overlapping ``[start, end)``."""
+    result = await db.execute(
+        select(Appointment.appointment_date, Appointment.end_date)
+        .where(Appointment.user_id == user_id)
+        .where(Appointment.status != "cancelled")
+        # Bounded on both sides so the (user_id, appointment_date) index does the work.
+        .where(Appointment.appointment_date > start - timedelta(minutes=MAX_DURATION_MINUTES))
+        .where(Appointment.appointment_date < end)
+        .where(Appointment.end_date > start)
+    )
+    return IntervalIndex((as_utc(s), as_utc(e)) for s, e in result)
+
+
+async def book_appointments(
+    db: AsyncSession, user_id: int, requests: list
+) -> Tuple[List[Tuple[int, int]], List[Tuple[int, str]]]:
+    """Book every request that fits and commit.
+
+    ``requests`` have ``doctor_name``, ``appointment_date``, ``duration_minutes``
+    and ``reason``. Earlier requests win over later ones they overlap. Returns
+    ``(created, conflicts)`` as ``(index, appointment_id)`` and ``(index, error)`` pairs.
+    """
+    slots = []
+    for request in requests:
+        start = as_utc(request.appointment_date)
+        slots.append((start, start + timedelta(minutes=request.duration_minutes)))
+
+    await _lock_user(db, user_id)
+    existing = await _busy(db, user_id, min(s for s, _ in slots), max(e for _, e in slots))
+    accepted = IntervalIndex()
+    rows, indexes, conflicts = [], [], []
+    for i, (request, (start, end)) in enumerate(zip(requests, slots)):
+        if existing.overlaps(start, end):
+            conflicts.append((i, "Overlaps an existing appointment"))
+        elif accepted.overlaps(start, end):
+            conflicts.append((i, "Overlaps an earlier appointment in this request"))
+        else:
+            accepted.add(start, end)
+            indexes.append(i)
+            rows.append({
+                "user_id": user_id,
+                "doctor_name": request.doctor_name,
+                "appointment_date": start,
+                "duration_minutes": request.duration_minutes,
+                "end_date": end,
+                "reason": request.reason,
+                "status": "scheduled",
+            })
+
+    if not rows:
+        await db.commit()
+        return [], conflicts
+    try:
+        result = await db.execute(
+            insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True), rows
+        )
+        created = list(zip(indexes, result.scalars().all()))
+    except IntegrityError as exc:
+        await db.rollback()
+        raise BookingConflict(str(exc.orig)) from exc
+    await db.commit()
+    for row in rows:
+        availability_cache.invalidate(row["doctor_name"], row["appointment_date"], row["end_date"])
+    return created, conflicts
+
+
+def prepare_schema(conn) -> None:
+    """Fill in end dates for appointments stored before durations existed and,
+    on PostgreSQL, add the no-overlap exclusion constraint. Runs at startup."""
+    table = Appointment.__table__
+    rows = conn.execute(
+        select(table.c.id, table.c.appointment_date, table.c.duration_minutes)
+        .where(table.c.end_date.is_(None))
+        .where(table.c.appointment_date.isnot(None))
+    ).all()
+    if rows:
+        conn.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(duration_minutes=bindparam("minutes"), end_date=bindparam("end")),
+            [
+                {
+                    "row_id": row_id,
+                    "minutes": minutes or DEFAULT_DURATION_MINUTES,
+                    "end": as_utc(start) + timedelta(minutes=minutes or DEFAULT_DURATION_MINUTES),
+                }
+                for row_id, start, minutes in rows
+            ],
+        )
+        logger.info("Backfilled end dates for %d appointment(s)", len(rows))
+
+    if conn.dialect.name != "postgresql":
+        return
+    exists = conn.execute(
+        text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": _NO_OVERLAP}
+    ).first()
+    if exists:
+        return
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+            conn.execute(text(
+                f"ALTER TABLE appointments ADD CONSTRAINT {_NO_OVERLAP} "
+                "EXCLUDE USING gist (user_id WITH =, tstzrange(appointment_date, end_date) WITH &&) "
+                "WHERE (status <> 'cancelled')"
+            ))
+    except DBAPIError:
+        logger.warning(
+            "Could not add %s; are overlapping appointments already stored?", _NO_OVERLAP,
+            exc_info=True,
+        )
@@ -0,0 +1,230 @@
+"""Incrementally maintained trend statistics for registered users.
+
+Every reading gets a per-user sequence number (the x of the trend fit) and
+is folded into daily ``TrendBucket`` rows holding n, Σx, Σy, Σx², Σxy. A
+trend request sums the buckets inside the window instead of re-reading and
+refitting every ``HealthData`` row, so its cost doesn't grow with history.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import dialect_insert
+from ..models.health_data import HealthData
+from ..models.trend_stats import TrendBucket, TrendState
+from .prediction_service import METRICS, trend_from_sums
+
+WINDOW_DAYS = 30
+ROWS_METRIC = "_rows"
+_BUCKET_METRICS = (ROWS_METRIC,) + METRICS
+_SUM_FIELDS = ("n", "sx", "sy", "sxx", "sxy")
+
+
+def as_utc(ts: datetime) -> datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns.
+    if ts.tzinfo is timezone.utc:
+        return ts
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def _window_start() -> date:
+    return datetime.now(timezone.utc).date() - timedelta(days=WINDOW_DAYS)
+
+
+class _BucketSums:
+    """Accumulates readings into per-(metric, day) sums relative to each bucket's first seq."""
+
+    def __init__(self):
+        self.buckets: dict = {}
+
+    def add(self, seq: int, reading: dict) -> None:
+        day = as_utc(reading["timestamp"]).date()
+        for metric in _BUCKET_METRICS:
+            y = 0.0 if metric == ROWS_METRIC else reading.get(metric)
+            if y is None:
+                continue
+            acc = self.buckets.get((metric, day))
+            if acc is None:
+                acc = self.buckets[(metric, day)] = [seq, 0, 0.0, 0.0, 0.0, 0.0]
+            x = seq - acc[0]
+            acc[1] += 1
+            acc[2] += x
+            acc[3] += y
+            acc[4] += x * x
+            acc[5] += x * y
+
+    def rows(self, user_id: int) -> list:
+        return [
+            {
+                "user_id": user_id,
+                "metric": metric,
+                "day": day,
+                "base_seq": acc[0],
+                **dict(zip(_SUM_FIELDS, acc[1:])),
+            }
+            for (metric, day), acc in self.buckets.items()
+        ]
+
+
+def _merge_bucket_stmt(db: AsyncSession):
+    """Upsert that adds new sums to an existing bucket, re-basing them onto its base_seq."""
+    stmt = dialect_insert(db, TrendBucket)
+    new = stmt.excluded
+    shift = new.base_seq - TrendBucket.base_seq
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "metric", "day"],
+        set_={
+            "n": TrendBucket.n + new.n,
+            "sx": TrendBucket.sx + new.sx + new.n * shift,
+            "sy": TrendBucket.sy + new.sy,
+            "sxx": TrendBucket.sxx + new.sxx + 2 * shift * new.sx + new.n * shift * shift,
+            "sxy": TrendBucket.sxy + new.sxy + shift * new.sy,
+        },
+    )
+
+
+async def record_readings(db: AsyncSession, user_id: int, readings: list) -> None:
+    """Fold new readings into the user's trend buckets inside the caller's transaction.
+
+    ``readings`` are dicts with a ``timestamp`` and metric values. If the
+    user has no state yet, nothing is recorded: the first trend request
+    rebuilds it from the table, which already includes these readings.
+    """
+    if not readings:
+        return
+    readings = sorted(readings, key=lambda r: as_utc(r["timestamp"]))
+
+    result = await db.execute(
+        update(TrendState)
+        .where(TrendState.user_id == user_id)
+        .values(next_seq=TrendState.next_seq + len(readings))
+    )
+    if result.rowcount == 0:
+        return
+    state = (
+        await db.execute(
+            select(TrendState.next_seq, TrendState.last_timestamp, TrendState.stale)
+            .where(TrendState.user_id == user_id)
+        )
+    ).one()
+    if state.stale:
+        return
+
+    first_ts = as_utc(readings[0]["timestamp"])
+    if state.last_timestamp is not None and first_ts < as_utc(state.last_timestamp):
+        # Sequence numbers must follow time order; let the next read rebuild.
+        await db.execute(
+            update(TrendState).where(TrendState.user_id == user_id).values(stale=True)
+        )
+        return
+
+    first_seq = state.next_seq - len(readings)
+    sums = _BucketSums()
+    for offset, reading in enumerate(readings):
+        sums.add(first_seq + offset, reading)
+
+    await db.execute(_merge_bucket_stmt(db), sums.rows(user_id))
+    await db.execute(
+        update(TrendState)
+        .where(TrendState.user_id == user_id)
+        .values(last_timestamp=as_utc(readings[-1]["timestamp"]))
+    )
+    await db.execute(
+        delete(TrendBucket)
+        .where(TrendBucket.user_id == user_id)
+        .where(TrendBucket.day < _window_start())
+    )
+
+
+async def rebuild_trend_stats(db: AsyncSession, user_id: int) -> None:
+    """Recompute a user's trend state from ``health_data`` (caller commits)."""
+    window_start = _window_start()
+    since = datetime.combine(window_start, time.min, tzinfo=timezone.utc)
+    result = await db.execute(
+        select(HealthData.timestamp, *(getattr(HealthData, m) for m in METRICS))
+        .where(HealthData.user_id == user_id)
+        .where(HealthData.timestamp >= since)
+        .order_by(HealthData.timestamp, HealthData.id)
+    )
+
+    sums = _BucketSums()
+    seq = 0
+    last_timestamp = None
+    for row in result:
+        reading = dict(row._mapping)
+        sums.add(seq, reading)
+        seq += 1
+        last_timestamp = as_utc(reading["timestamp"])
+
+    await db.execute(delete(TrendBucket).where(TrendBucket.user_id == user_id))
+    if sums.buckets:
+        await db.execute(dialect_insert(db, TrendBucket), sums.rows(user_id))
+
+    state = {"next_seq": seq, "last_timestamp": last_timestamp, "stale": False}
+    stmt = dialect_insert(db, TrendState).values(user_id=user_id, **state)
+    await db.execute(stmt.on_conflict_do_update(index_elements=["user_id"], set_=state))
+
+
+async def get_trends(
+    db: AsyncSession, user_id: int, read_db: Optional[AsyncSession] = None
+) -> dict:
+    """Trend predictions for the last ``WINDOW_DAYS`` days, same shape as ``predict_trends``.
+
+    Reads go through ``read_db`` when given; a missing or stale state is
+    rebuilt on ``db``, which is then read from too. ``read_db`` gives its
+    connection back first, so the rebuild never holds two at once.
+    """
+    if read_db is None:
+        read_db = db
+    state = (
+        await read_db.execute(select(TrendState).where(TrendState.user_id == user_id))
+    ).scalar_one_or_none()
+    if state is None or state.stale:
+        if read_db is not db:
+            await read_db.close()
+        await rebuild_trend_stats(db, user_id)
+        await db.commit()
+        read_db = db
+        state = (
+            await db.execute(
+                select(TrendState)
+                .where(TrendState.user_id == user_id)
+                .execution_options(populate_existing=True)
+            )
+        ).scalar_one()
+
+    result = await read_db.execute(
+        select(TrendBucket)
+        .where(TrendBucket.user_id == user_id)
+        .where(TrendBucket.day >= _window_start())
+    )
+    buckets = result.scalars().all()
+
+    row_buckets = [b for b in buckets if b.metric == ROWS_METRIC]
+    if not row_buckets:
+        return {"error": "Insufficient data for prediction"}
+    origin = min(b.base_seq for b in row_buckets)
+    n_rows = state.next_seq - origin
+    if n_rows < 3:
+        return {"error": "Insufficient data for prediction"}
+
+    totals = {metric: [0, 0.0, 0.0, 0.0, 0.0] for metric in METRICS}
+    for b in buckets:
+        if b.metric not in totals:
+            continue
+        # Re-base each bucket's sums from its own base_seq onto the window origin.
+        d = b.base_seq - origin
+        t = totals[b.metric]
+        t[0] += b.n
+        t[1] += b.sx + b.n * d
+        t[2] += b.sy
+        t[3] += b.sxx + 2 * d * b.sx + b.n * d * d
+        t[4] += b.sxy + d * b.sy
+
+    return {
+        metric: trend_from_sums(*t, n_rows=n_rows)
+        for metric, t in totals.items()
+        if t[0] > 2
+    }
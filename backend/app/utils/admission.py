@@ -0,0 +1,119 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when a bounded resource is saturated; mapped to 503 + Retry-After."""
+
+    def __init__(self, resource: str, retry_after: int, reason: str = "queue full"):
+        super().__init__(f"{resource} is overloaded ({reason})")
+        self.resource = resource
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """Caps concurrent use of a backend with a bounded FIFO wait queue.
+
+    Up to ``max_concurrency`` callers hold a slot at once, up to ``max_queue``
+    more wait for one, and a waiter gives up after ``queue_timeout`` seconds.
+    Anything beyond that is rejected immediately with ``AdmissionRejected``.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: deque = deque()
+        self._avg_hold = 1.0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_hold * backlog / max(self.max_concurrency, 1)))
+
+    async def acquire(self) -> None:
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self.name, self._retry_after())
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(fut, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise AdmissionRejected(self.name, self._retry_after(), "queue timeout")
+        except asyncio.CancelledError:
+            # The slot may have been handed to us just before we were cancelled.
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        finally:
+            if not fut.done() or fut.cancelled():
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            waited = time.monotonic() - started
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        self.admitted += 1
+
+    def release(self) -> None:
+        # Hand the slot straight to the next live waiter so it can't be stolen.
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._active -= 1
+
+    def _finish(self, started: float) -> None:
+        self._avg_hold = 0.9 * self._avg_hold + 0.1 * (time.monotonic() - started)
+        self.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._finish(started)
+
+    def hold_until(self, future: asyncio.Future) -> None:
+        """Release an acquired slot when ``future`` is done rather than when the caller is.
+
+        For work that outlives its caller, like a thread that can't be cancelled.
+        """
+        started = time.monotonic()
+        future.add_done_callback(lambda _: self._finish(started))
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(1000 * self._total_wait / self.admitted, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(1000 * self._max_wait, 2),
+        }
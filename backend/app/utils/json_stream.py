@@ -0,0 +1,136 @@
+import codecs
+import json
+import re
+from typing import AsyncIterator, List, Optional, Tuple
+
+_WS = re.compile(r"[ \t\r\n]*")
+
+
+class JSONStreamError(ValueError):
+    """The body can't be parsed any further (broken array syntax or an oversized record)."""
+
+
+class JSONRecordParser:
+    """Incremental parser for a body that is either a JSON array or NDJSON.
+
+    The first non-whitespace character decides: ``[`` means an array,
+    anything else means one JSON value per line. ``feed`` takes text as it
+    arrives and returns the records completed so far as ``(value, error)``
+    pairs, so only one partial record is ever buffered. A bad NDJSON line
+    becomes an error for that record; a syntax error inside an array can't
+    be skipped and raises ``JSONStreamError``.
+    """
+
+    def __init__(self, max_record_bytes: int = 64 * 1024):
+        self.max_record_bytes = max_record_bytes
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._mode: Optional[str] = None
+        # Array state: "start" -> "first" -> ("value" <-> "sep") -> "done"
+        self._state = "start"
+        self._count = 0
+        self._error: Optional[JSONStreamError] = None
+
+    def feed(self, text: str) -> List[Tuple[object, Optional[str]]]:
+        return self._parse(text, final=False)
+
+    def close(self) -> List[Tuple[object, Optional[str]]]:
+        records = self._parse("", final=True)
+        if self._mode == "array" and self._state != "done":
+            raise JSONStreamError("Unterminated JSON array")
+        return records
+
+    def _parse(self, text: str, final: bool) -> list:
+        if self._error is not None:
+            raise self._error
+        self._buf += text
+        if self._mode is None:
+            i = _WS.match(self._buf).end()
+            if i == len(self._buf):
+                return []
+            self._mode = "array" if self._buf[i] == "[" else "ndjson"
+
+        records = self._parse_array(final) if self._mode == "array" else self._parse_ndjson(final)
+        if len(self._buf) > self.max_record_bytes:
+            raise JSONStreamError(f"Record exceeds {self.max_record_bytes} bytes")
+        return records
+
+    def _parse_ndjson(self, final: bool) -> list:
+        lines = self._buf.split("\n")
+        self._buf = "" if final else lines.pop()
+        records = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append((json.loads(line), None))
+            except json.JSONDecodeError as exc:
+                records.append((None, f"Invalid JSON: {exc.msg}"))
+        return records
+
+    def _parse_array(self, final: bool) -> list:
+        records: list = []
+        try:
+            self._scan_array(final, records)
+        except JSONStreamError as exc:
+            if not records:
+                raise
+            # Hand back the records before the error; the next call raises it.
+            self._error = exc
+        return records
+
+    def _scan_array(self, final: bool, records: list) -> None:
+        buf, i = self._buf, 0
+        while True:
+            i = _WS.match(buf, i).end()
+            if i == len(buf):
+                break
+            c = buf[i]
+            if self._state == "done":
+                raise JSONStreamError("Unexpected data after JSON array")
+            if self._state == "start":
+                i += 1
+                self._state = "first"
+            elif self._state == "sep":
+                if c == ",":
+                    self._state = "value"
+                elif c == "]":
+                    self._state = "done"
+                else:
+                    raise JSONStreamError(f"Expected ',' or ']' after record {self._count - 1}")
+                i += 1
+            elif self._state == "first" and c == "]":
+                self._state = "done"
+                i += 1
+            else:
+                try:
+                    value, end = self._decoder.raw_decode(buf, i)
+                except json.JSONDecodeError as exc:
+                    if final:
+                        raise JSONStreamError(
+                            f"Invalid JSON in record {self._count}: {exc.msg}"
+                        ) from None
+                    break  # most likely a record split across chunks
+                if end == len(buf) and not final and not isinstance(value, (dict, list)):
+                    break  # a bare number might continue in the next chunk
+                records.append((value, None))
+                self._count += 1
+                self._state = "sep"
+                i = end
+        self._buf = buf[i:]
+
+
+async def iter_json_records(
+    chunks: AsyncIterator[bytes], max_record_bytes: int = 64 * 1024
+) -> AsyncIterator[Tuple[object, Optional[str]]]:
+    """Yield ``(value, error)`` for each record of a streamed JSON array or NDJSON body."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parser = JSONRecordParser(max_record_bytes)
+    async for chunk in chunks:
+        for record in parser.feed(decoder.decode(chunk)):
+            yield record
+    for record in parser.feed(decoder.decode(b"", final=True)):
+        yield record
+    for record in parser.close():
+        yield record
@@ -0,0 +1,67 @@
+"""Keyset (cursor) pagination on ``(sort_value, id)``.
+
+A cursor is the opaque, URL-safe encoding of the last row's sort value and
+id. The next page seeks past it with a row-value comparison, so the database
+jumps straight to it through the index instead of counting off an offset.
+Cursors are returned in the ``X-Next-Cursor`` header, which is absent on the
+last page, so response bodies keep their shape.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Callable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    raw = json.dumps([sort_value.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_keyset(query, sort_col, id_col, cursor: Optional[str], limit: int, descending: bool = True):
+    """Order ``query`` by (sort_col, id_col), start after ``cursor`` and fetch one extra row."""
+    if cursor:
+        key = decode_cursor(cursor)
+        position = tuple_(sort_col, id_col)
+        query = query.where(position < key if descending else position > key)
+    if descending:
+        query = query.order_by(sort_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(sort_col, id_col)
+    return query.limit(limit + 1)
+
+
+def finish_page(rows: Sequence, limit: int, key: Callable, response: Response) -> list:
+    """Trim the look-ahead row and, if there was one, set the next-page cursor header."""
+    rows = list(rows)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
+
+
+class KeyView:
+    """Read-only view of ``items`` mapped through ``key``, for ``bisect`` on sorted lists."""
+
+    def __init__(self, items: Sequence, key: Callable):
+        self.items = items
+        self.key = key
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.key(self.items[index])
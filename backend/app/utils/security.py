@@ -1,41 +1,86 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import uuid
 import os
 
-from ..database import get_db
+from ..database import get_read_db, set_session_owner
 from ..models.user import User
 from ..config import get_settings
+from .admission import AdmissionController
+from .user_cache import CachedUser, user_cache
 
 settings = get_settings()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with another cost are flagged by verify_and_update and rehashed on login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 # Set auto_error=False to allow optional authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token", auto_error=False)
 
 GUEST_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours for guests
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool, off the event loop.
 
+    bcrypt releases the GIL, so a hash only occupies its worker thread. At
+    most ``workers`` run at once and up to ``max_queue`` more wait; beyond
+    that callers get ``AdmissionRejected`` (503) straight away, so a login
+    burst can't build an unbounded backlog.
+    """
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+    def __init__(self, workers: int, max_queue: int, queue_timeout: float):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._admission = AdmissionController("password hashing", workers, max_queue, queue_timeout)
+
+    async def _run(self, fn, *args):
+        await self._admission.acquire()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        except BaseException:
+            self._admission.release()
+            raise
+        # The slot follows the thread: a caller that disconnects mid-hash
+        # mustn't let another hash start while this one still runs.
+        self._admission.hold_until(future)
+        return await asyncio.shield(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """``(valid, new_hash)``; ``new_hash`` is set when the stored hash should be replaced."""
+        return await self._run(pwd_context.verify_and_update, password, hashed)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return self._admission.stats()
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+    queue_timeout=settings.password_hash_queue_timeout_seconds,
+)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
+    now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=15)
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
@@ -66,9 +111,41 @@ def decode_token(token: str) -> Optional[dict]:
         return None
 
 
+def _guest_user(username: str, payload: dict) -> dict:
+    return {
+        "id": None,
+        "username": username,
+        "is_guest": True,
+        # Guest data lives only as long as the token.
+        "expires_at": payload.get("exp") or time.time() + GUEST_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+async def resolve_user(payload: dict, db: AsyncSession) -> Optional[CachedUser]:
+    """Registered user for a decoded token, from its claims, the cache, or the database."""
+    username = payload["sub"]
+    user_id = payload.get("user_id")
+    has_claims = user_id is not None and "is_active" in payload
+    if has_claims and user_cache.trusts_claims(user_id, payload.get("iat")):
+        return user_cache.from_claims(user_id, username, payload["is_active"])
+
+    user = user_cache.get(username)
+    if user is None:
+        result = await db.execute(
+            select(User.id, User.username, User.is_active).where(User.username == username)
+        )
+        row = result.first()
+        if row is None:
+            return None
+        user = CachedUser(*row)
+        user_cache.put(user)
+    return user
+
+
 async def get_current_user_optional(
+    request: Request,
     token: Optional[str] = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Optional[dict]:
     """Get current user - returns None for unauthenticated users"""
     if not token:
@@ -85,17 +162,12 @@ async def get_current_user_optional(
         return None
     
     if is_guest:
-        return {
-            "id": None,
-            "username": username,
-            "is_guest": True
-        }
+        return _guest_user(username, payload)
     
-    # For registered users, fetch from database
-    result = await db.execute(select(User).where(User.username == username))
-    user = result.scalar_one_or_none()
+    set_session_owner(request, username)
+    user = await resolve_user(payload, db)
     
-    if user is None:
+    if user is None or not user.is_active:
         return None
     
     return {
@@ -107,8 +179,9 @@ async def get_current_user_optional(
 
 
 async def get_current_user(
+    request: Request,
     token: Optional[str] = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get current user - allows guests but requires some form of authentication"""
     credentials_exception = HTTPException(
@@ -132,17 +205,12 @@ async def get_current_user(
     
     # For guest users, return guest info
     if is_guest:
-        return {
-            "id": None,
-            "username": username,
-            "is_guest": True
-        }
+        return _guest_user(username, payload)
     
-    # For registered users, fetch from database
-    result = await db.execute(select(User).where(User.username == username))
-    user = result.scalar_one_or_none()
+    set_session_owner(request, username)
+    user = await resolve_user(payload, db)
     
-    if user is None:
+    if user is None or not user.is_active:
         raise credentials_exception
     
     return {
@@ -154,11 +222,12 @@ async def get_current_user(
 
 
 async def get_authenticated_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get current user - requires full authentication (no guests allowed)"""
-    user_info = await get_current_user(token, db)
+    user_info = await get_current_user(request, token, db)
     
     if user_info.get("is_guest"):
         raise HTTPException(
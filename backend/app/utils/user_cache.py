@@ -0,0 +1,146 @@
+"""In-process cache of authenticated users, so resolving a token rarely touches the database.
+
+Access tokens carry ``user_id`` and ``is_active`` claims and are trusted on
+those alone, unless the user was invalidated after the token was issued.
+Then, and for older tokens without the claims, the user is loaded by
+username and cached for a short TTL. Invalidation happens automatically when
+a ``User`` row is updated or deleted through the ORM in this process; a
+change made from another process reaches claim-only tokens when they are
+reissued.
+"""
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import event, inspect
+
+from ..config import get_settings
+from ..models.user import User
+
+settings = get_settings()
+
+
+class CachedUser:
+    """The fields requests need from ``User``, detached from any session."""
+
+    __slots__ = ("id", "username", "is_active")
+
+    def __init__(self, id: int, username: str, is_active: bool = True):
+        self.id = id
+        self.username = username
+        self.is_active = bool(is_active)
+
+
+class UserCache:
+    """LRU cache of users by username, bounded by entry count and TTL.
+
+    ``invalidate`` drops the user and leaves a tombstone for ``tombstone_seconds``
+    (the access-token lifetime): tokens issued before it can't be trusted on
+    their claims any more.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, tombstone_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.tombstone_seconds = tombstone_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._usernames: dict = {}
+        self._tombstones: dict = {}
+        self.claim_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def trusts_claims(self, user_id: int, issued_at: Optional[float]) -> bool:
+        invalidated_at = self._tombstones.get(user_id)
+        if invalidated_at is None:
+            return True
+        if invalidated_at + self.tombstone_seconds <= time.time():
+            del self._tombstones[user_id]
+            return True
+        return issued_at is not None and issued_at > invalidated_at
+
+    def from_claims(self, user_id: int, username: str, is_active: bool) -> CachedUser:
+        self.claim_hits += 1
+        return CachedUser(user_id, username, is_active)
+
+    def get(self, username: str) -> Optional[CachedUser]:
+        entry = self._entries.get(username)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(username)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(username)
+        self.hits += 1
+        return user
+
+    def put(self, user: CachedUser) -> None:
+        if self.max_entries <= 0:
+            return
+        if user.username in self._entries:
+            self._remove(user.username)
+        self._entries[user.username] = (user, time.monotonic() + self.ttl_seconds)
+        self._usernames[user.id] = user.username
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        username = self._usernames.get(user_id)
+        if username is not None:
+            self._remove(username)
+        now = time.time()
+        self._tombstones = {
+            uid: at for uid, at in self._tombstones.items() if at + self.tombstone_seconds > now
+        }
+        self._tombstones[user_id] = now
+
+    def _remove(self, username: str) -> None:
+        user, _ = self._entries.pop(username)
+        self._usernames.pop(user.id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._usernames.clear()
+        self._tombstones.clear()
+
+    def stats(self) -> dict:
+        resolved = self.claim_hits + self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "tombstones": len(self._tombstones),
+            "claim_hits": self.claim_hits,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.claim_hits + self.hits) / resolved, 4) if resolved else 0.0,
+        }
+
+
+user_cache = UserCache(
+    max_entries=settings.user_cache_max_entries,
+    ttl_seconds=settings.user_cache_ttl_seconds,
+    tombstone_seconds=settings.access_token_expire_minutes * 60,
+)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Forget a user after it changed; call it for changes made outside the ORM too."""
+    user_cache.invalidate(user_id)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_update(mapper, connection, target) -> None:
+    # A password rehash on login changes nothing the cache holds.
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in CachedUser.__slots__):
+        invalidate_user(target.id)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_on_delete(mapper, connection, target) -> None:
+    invalidate_user(target.id)
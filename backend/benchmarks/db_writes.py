@@ -0,0 +1,103 @@
+"""Benchmark: concurrent ``add_health_data`` commits on SQLite, default vs. tuned profile.
+
+Run from ``backend/``::
+
+    python -m benchmarks.db_writes [--writers 20] [--commits 50]
+
+Each writer repeats the write path of ``POST /api/health/health-data``
+(insert a reading, update trend state and rollups, commit) for its own
+user. ``default`` is the engine as it was configured before the database
+profile (rollback journal, ``synchronous=FULL``, pre-ping); ``tuned`` is
+``app.database.create_engine`` with the configured PRAGMAs. Each profile
+gets a fresh database file.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_engine
+from app.models import user, appointment, doctor_schedule, health_data, rollups as rollup_models, trend_results, trend_stats as trend_models  # noqa: F401
+from app.models.health_data import HealthData
+from app.models.user import User
+from app.services import rollups, trend_stats
+
+
+async def _writer(Session, user_id: int, commits: int, latencies: list) -> int:
+    rng = random.Random(user_id)
+    now = datetime.now(timezone.utc) - timedelta(days=1)
+    errors = 0
+    async with Session() as db:
+        for i in range(commits):
+            reading = {
+                "timestamp": now + timedelta(seconds=i),
+                "heart_rate": rng.gauss(72, 5),
+                "blood_pressure_systolic": rng.gauss(120, 8),
+            }
+            started = time.perf_counter()
+            try:
+                db.add(HealthData(user_id=user_id, **reading))
+                await trend_stats.record_readings(db, user_id, [reading])
+                await rollups.record_readings(db, user_id, [reading])
+                await db.commit()
+            except OperationalError:
+                # "database is locked" once the busy timeout runs out
+                await db.rollback()
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+    return errors
+
+
+async def run(profile: str, writers: int, commits: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        if profile == "default":
+            engine = create_async_engine(url, pool_pre_ping=True)
+        else:
+            engine = create_engine(url)
+        Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with Session() as db:
+            users = [User(username=f"bench{i}", email=f"bench{i}@example.com", hashed_password="x")
+                     for i in range(writers)]
+            db.add_all(users)
+            await db.commit()
+            user_ids = [u.id for u in users]
+
+        latencies: list = []
+        started = time.perf_counter()
+        errors = await asyncio.gather(*(_writer(Session, uid, commits, latencies) for uid in user_ids))
+        elapsed = time.perf_counter() - started
+        await engine.dispose()
+
+    latencies.sort()
+    done = len(latencies) - sum(errors)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{profile:>8} {done / elapsed:>10.0f} {latencies[len(latencies) // 2] * 1e3:>9.1f}ms "
+        f"{p99 * 1e3:>9.1f}ms {sum(errors):>7}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.db_writes")
+    parser.add_argument("--writers", type=int, default=20, help="Concurrent sessions")
+    parser.add_argument("--commits", type=int, default=50, help="Commits per writer")
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers x {args.commits} commits")
+    print(f"{'profile':>8} {'commits/s':>10} {'p50':>11} {'p99':>11} {'errors':>7}")
+    for profile in ("default", "tuned"):
+        asyncio.run(run(profile, args.writers, args.commits))
+
+
+if __name__ == "__main__":
+    main()
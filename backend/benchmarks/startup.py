@@ -0,0 +1,86 @@
+"""Benchmark: worker cold start, as import time and time to first request.
+
+Run from ``backend/`` with the usual environment (``DATABASE_URL``,
+``SECRET_KEY``)::
+
+    python -m benchmarks.startup [--runs 5]
+
+Each run starts a fresh interpreter. ``import`` is the time to import
+``app.main``; ``first request`` is the time from launching
+``uvicorn app.main:app`` to the first successful ``GET /health``, which
+includes the import and the app's startup hooks. The schema is created once
+up front with ``python -m app.manage init-db``.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def time_import() -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], check=True, capture_output=True, text=True
+    ).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_first_request(timeout: float = 60.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                    return time.perf_counter() - started
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited before serving a request")
+                time.sleep(0.01)
+        raise RuntimeError(f"no response within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, "-m", "app.manage", "init-db"], check=True, stdout=subprocess.DEVNULL)
+    # Warm the bytecode cache so the first run isn't an outlier.
+    time_import()
+
+    imports = [time_import() for _ in range(args.runs)]
+    firsts = [time_first_request() for _ in range(args.runs)]
+    print(f"{'':>14} {'median':>9} {'min':>9} {'max':>9}")
+    for name, samples in (("import", imports), ("first request", firsts)):
+        print(
+            f"{name:>14} {statistics.median(samples) * 1e3:>7.0f}ms "
+            f"{min(samples) * 1e3:>7.0f}ms {max(samples) * 1e3:>7.0f}ms"
+        )
+    print(f"TREND_POOL_WORKERS={os.environ.get('TREND_POOL_WORKERS', 'default')}")
+
+
+if __name__ == "__main__":
+    main()
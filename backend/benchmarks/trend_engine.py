@@ -0,0 +1,90 @@
+"""Micro-benchmark: NumPy closed-form trends vs. the old pandas/sklearn path.
+
+Run from ``backend/``::
+
+    python -m benchmarks.trend_engine
+
+The legacy path needs ``pandas`` and ``scikit-learn``, which the API no
+longer depends on; it is skipped when they aren't installed.
+"""
+import random
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from app.services.prediction_service import predict_trends
+
+SIZES = (10, 1_000, 100_000)
+
+
+def legacy_predict(health_data: list) -> dict:
+    """The pre-NumPy implementation, kept here only for comparison."""
+    import numpy as np
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
+
+    if len(health_data) < 3:
+        return {"error": "Insufficient data for prediction"}
+
+    df = pd.DataFrame(health_data)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df = df.sort_values("timestamp")
+    df["time_index"] = range(len(df))
+
+    predictions = {}
+    for metric in ["heart_rate", "blood_pressure_systolic", "weight"]:
+        if metric in df.columns and df[metric].notna().sum() > 2:
+            X = df["time_index"].values.reshape(-1, 1)
+            y = df[metric].ffill().values
+            model = LinearRegression()
+            model.fit(X, y)
+            future_indices = np.array(range(len(df), len(df) + 7)).reshape(-1, 1)
+            predictions[metric] = {
+                "current_trend": "increasing" if model.coef_[0] > 0 else "decreasing",
+                "next_7_days": model.predict(future_indices).tolist(),
+                "trend_strength": abs(model.coef_[0]),
+            }
+    return predictions
+
+
+def make_readings(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc) - timedelta(minutes=n)
+    return [
+        {
+            "timestamp": start + timedelta(minutes=i),
+            "heart_rate": 70 + 0.01 * i + rng.gauss(0, 3),
+            "blood_pressure_systolic": 120 - 0.005 * i + rng.gauss(0, 5),
+            "weight": 80 + rng.gauss(0, 0.5),
+        }
+        for i in range(n)
+    ]
+
+
+def bench(fn, data: list) -> float:
+    timer = timeit.Timer(lambda: fn(data))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def main():
+    try:
+        import pandas  # noqa: F401
+        import sklearn  # noqa: F401
+        have_legacy = True
+    except ImportError:
+        have_legacy = False
+        print("pandas/scikit-learn not installed; timing the NumPy engine only")
+
+    print(f"{'points':>8} {'numpy':>12} {'legacy':>12} {'speedup':>8}")
+    for n in SIZES:
+        data = make_readings(n)
+        new = bench(predict_trends, data)
+        if have_legacy:
+            old = bench(legacy_predict, data)
+            print(f"{n:>8} {new * 1e3:>10.3f}ms {old * 1e3:>10.3f}ms {old / new:>7.1f}x")
+        else:
+            print(f"{n:>8} {new * 1e3:>10.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""Test settings: a throwaway SQLite file and cheap password hashing.
+
+Settings and engines are created at import time, so the environment has to
+be in place before anything under ``app`` is imported.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="health-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("TREND_POOL_WORKERS", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.pop("READ_DATABASE_URL", None)
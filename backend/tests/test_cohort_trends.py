@@ -0,0 +1,89 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal, engine
+from app.manage import init_db
+from app.models.health_data import HealthData
+from app.models.trend_results import TrendResult, TrendRun
+from app.models.user import User
+from app.services import cohort_trends
+
+
+async def _seed(users: int, readings: int) -> list:
+    await init_db(None)
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        accounts = [
+            User(username=f"cohort{i}", email=f"cohort{i}@example.com", hashed_password="x")
+            for i in range(users)
+        ]
+        db.add_all(accounts)
+        await db.flush()
+        db.add_all(
+            HealthData(
+                user_id=u.id,
+                timestamp=now - timedelta(hours=h),
+                heart_rate=70 + h,
+                blood_pressure_systolic=120 + i + h,
+            )
+            for i, u in enumerate(accounts)
+            for h in range(readings)
+        )
+        await db.commit()
+        return [u.id for u in accounts]
+
+
+def test_cohort_run_commits_in_short_transactions(monkeypatch):
+    database = make_url(get_settings().database_url).database
+    fit = cohort_trends.fit_grouped_trends
+    outside_writes = []
+
+    def fit_and_write(values, starts):
+        # Another writer while the job is busy; it must not find the database locked.
+        conn = sqlite3.connect(database, timeout=0.5)
+        try:
+            with conn:
+                conn.execute("UPDATE users SET is_active = is_active WHERE id = 1")
+            outside_writes.append("ok")
+        except sqlite3.OperationalError as e:
+            outside_writes.append(str(e))
+        finally:
+            conn.close()
+        return fit(values, starts)
+
+    monkeypatch.setattr(cohort_trends, "fit_grouped_trends", fit_and_write)
+    monkeypatch.setattr(cohort_trends, "new_process_pool", lambda workers: ThreadPoolExecutor(workers))
+
+    async def run() -> tuple:
+        try:
+            user_ids = await _seed(users=6, readings=5)
+            async with AsyncSessionLocal() as db:
+                # Chunks smaller than one user's history exercise the whole-user fallback.
+                first = await cohort_trends.run_cohort_trends(db, chunk_rows=4, workers=1, keep_runs=1)
+                second = await cohort_trends.run_cohort_trends(db, chunk_rows=4, workers=1, keep_runs=1)
+                latest = await cohort_trends.latest_run(db)
+                runs = (await db.execute(select(TrendRun.id))).scalars().all()
+                results = (
+                    await db.execute(
+                        select(func.count())
+                        .where(TrendResult.run_id == second.id)
+                        .where(TrendResult.user_id.in_(user_ids))
+                    )
+                ).scalar_one()
+                return first, second, latest, runs, results
+        finally:
+            # Pooled aiosqlite connections belong to this event loop.
+            await engine.dispose()
+
+    first, second, latest, runs, results = asyncio.run(run())
+    assert outside_writes and set(outside_writes) == {"ok"}
+    assert second.finished_at is not None and second.users == first.users >= 6
+    assert latest.id == second.id
+    assert runs == [second.id]
+    assert results == 6 * 2  # heart rate and blood pressure per user
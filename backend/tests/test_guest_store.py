@@ -0,0 +1,113 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.guest_store import GuestStore, MemoryGuestStore
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _store(backend: str) -> GuestStore:
+    if backend == "memory":
+        return MemoryGuestStore()
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.services.redis_guest_store import RedisGuestStore
+
+    store = RedisGuestStore("redis://localhost:6379/0")
+    store._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    return store
+
+
+def _reading(minutes: int, heart_rate: int) -> dict:
+    return {"timestamp": T0 + timedelta(minutes=minutes), "heart_rate": heart_rate}
+
+
+async def _pages(fetch, limit: int, field: str) -> list:
+    """Every page from ``fetch(limit, before)``, following the (``field``, id) cursor."""
+    pages, before = [], None
+    while True:
+        page = await fetch(limit, before)
+        if not page:
+            return pages
+        pages.append(page)
+        before = (page[-1][field], page[-1]["id"])
+
+
+async def _scenario(store: GuestStore) -> dict:
+    """The guest operations the routers use, with what each returned."""
+    alive = time.time() + 3600
+    seen = {}
+    # Out of order, across a batch and single writes, with ties on the timestamp.
+    await store.add_readings("g", alive, [_reading(3, 1), _reading(1, 2), _reading(1, 3)])
+    await store.add_readings("g", alive, [_reading(0, 4)])
+    await store.add_readings("g", alive, [_reading(1, 5)])
+    await store.add_readings("g", alive, [_reading(3, 6), _reading(2, 7)])
+    seen["all"] = await store.readings("g")
+    seen["since"] = await store.readings("g", T0 + timedelta(minutes=2))
+    seen["pages"] = await _pages(
+        lambda limit, before: store.recent_readings("g", T0, limit, before), 2, "timestamp"
+    )
+    seen["windowed"] = await store.recent_readings("g", T0 + timedelta(minutes=1), 10)
+    seen["skip"] = await store.recent_readings("g", T0, 2, skip=1)
+
+    for day, name in ((2, "b"), (1, "a"), (2, "c")):
+        await store.add_medicine(
+            "g", alive, {"name": name, "start_date": T0 + timedelta(days=day), "end_date": None}
+        )
+    seen["medicine_pages"] = await _pages(
+        lambda limit, before: store.recent_medicines("g", limit, before), 2, "start_date"
+    )
+
+    await store.add_readings("expired", time.time() - 1, [_reading(0, 1)])
+    seen["expired"] = await store.readings("expired")
+    await store.clear("g")
+    seen["cleared"] = (await store.readings("g"), await store.recent_medicines("g", 10))
+    return seen
+
+
+def _run(backend: str) -> dict:
+    store = _store(backend)
+
+    async def run() -> dict:
+        try:
+            return await _scenario(store)
+        finally:
+            await store.aclose()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_guest_store_semantics(backend):
+    seen = _run(backend)
+    order = [(r["timestamp"], r["id"]) for r in seen["all"]]
+    assert order == sorted(order) and len(order) == 7
+    assert [r["heart_rate"] for r in seen["all"]] == [4, 2, 3, 5, 7, 1, 6]
+    assert [r["heart_rate"] for r in seen["since"]] == [7, 1, 6]
+
+    pages = seen["pages"]
+    assert [len(p) for p in pages] == [2, 2, 2, 1]
+    assert [r for p in pages for r in p] == seen["all"][::-1]
+    assert [r["heart_rate"] for r in seen["windowed"]] == [6, 1, 7, 5, 3, 2]
+    assert seen["skip"] == seen["all"][::-1][1:3]
+
+    medicines = [r["name"] for p in seen["medicine_pages"] for r in p]
+    assert medicines == ["c", "b", "a"]
+    assert seen["expired"] == []
+    assert seen["cleared"] == ([], [])
+
+
+def test_memory_and_redis_stores_agree():
+    pytest.importorskip("fakeredis")
+    assert _run("memory") == _run("redis")
+
+
+def test_incomplete_store_fails_when_created():
+    class NoClear(GuestStore):
+        async def add_readings(self, guest_id, expires_at, readings):
+            pass
+
+    with pytest.raises(TypeError):
+        NoClear()
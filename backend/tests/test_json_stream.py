@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.main import app
+from app.utils.json_stream import JSONStreamError, iter_json_records
+
+
+def _collect(chunks: list) -> tuple:
+    """Records parsed from ``chunks``, and the ``JSONStreamError`` that ended them if any."""
+    records = []
+
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        try:
+            async for record in iter_json_records(stream()):
+                records.append(record)
+        except JSONStreamError as exc:
+            return exc
+        return None
+
+    return records, asyncio.run(collect())
+
+
+def _every_split(body: bytes):
+    """The body in two chunks at every byte offset, then one byte at a time."""
+    for cut in range(len(body) + 1):
+        yield [body[:cut], body[cut:]]
+    yield [body[i:i + 1] for i in range(len(body))]
+
+
+RECORDS = [
+    {"heart_rate": 72.5, "n": 12345},
+    {"symptoms": 'he said "hi" \\ then \\"left\\"', "tab": "a\tb"},
+    {"symptoms": "café, naïve, 漢字 and 😀"},
+    67,
+    [],
+]
+
+
+@pytest.mark.parametrize("layout", ["array", "ndjson"])
+def test_records_split_anywhere_parse_the_same(layout):
+    if layout == "array":
+        body = json.dumps(RECORDS, ensure_ascii=False).encode()
+    else:
+        body = "\n".join(json.dumps(r, ensure_ascii=False) for r in RECORDS).encode()
+    expected = [(r, None) for r in RECORDS]
+    for chunks in _every_split(body):
+        assert _collect(chunks) == (expected, None), chunks
+
+
+def test_trailing_partial_record_at_eof():
+    # NDJSON: the unterminated last line is a record; a cut-off one is a row error.
+    assert _collect([b'{"a": 1}\n{"a": 2}']) == ([({"a": 1}, None), ({"a": 2}, None)], None)
+    records, error = _collect([b'{"a": 1}\n{"a": ', b"2"])
+    assert error is None
+    assert records[0] == ({"a": 1}, None)
+    assert records[1][0] is None and records[1][1].startswith("Invalid JSON")
+
+    # Array: records before the break come back, then the stream fails.
+    records, error = _collect([b'[{"a": 1}, {"a": ', b"2"])
+    assert records == [({"a": 1}, None)]
+    assert isinstance(error, JSONStreamError)
+
+
+def test_bulk_ndjson_reports_row_errors_and_keeps_good_rows():
+    lines = [
+        json.dumps({"timestamp": "2026-01-01T08:00:00Z", "heart_rate": 70}),
+        "{not json",
+        json.dumps({"heart_rate": 71}),
+        json.dumps([1, 2]),
+        json.dumps({"timestamp": "2026-01-01T09:00:00Z", "heart_rate": 72}),
+    ]
+    body = ("\n".join(lines) + "\n").encode()
+
+    async def post():
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                token = (await client.post("/api/auth/guest")).json()["access_token"]
+
+                async def chunks():
+                    # Cut mid-line so records straddle chunks.
+                    for i in range(0, len(body), 7):
+                        yield body[i:i + 7]
+
+                response = await client.post(
+                    "/api/health/health-data/bulk",
+                    content=chunks(),
+                    headers={"Authorization": f"Bearer {token}", "Content-Type": "application/x-ndjson"},
+                )
+                return response.status_code, response.json()
+
+    status, summary = asyncio.run(post())
+    assert status == 200
+    assert (summary["received"], summary["inserted"], summary["failed"]) == (5, 2, 3)
+    assert [e["index"] for e in summary["errors"]] == [1, 2, 3]
+    assert summary["errors"][0]["error"].startswith("Invalid JSON")
+    assert summary["errors"][1]["error"].startswith("timestamp")
+    assert summary["errors"][2]["error"] == "Expected a JSON object"
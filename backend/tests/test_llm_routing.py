@@ -0,0 +1,136 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import httpx
+
+from app.routers.chat import _sse_events
+from app.services import gemini_service
+from app.services.gemini_service import BackendHealth, GeminiService
+
+
+def test_backend_with_only_failures_scores_worse_than_a_working_one():
+    failing = BackendHealth("gemini")
+    failing.record(0.01, ok=False)
+    failing.record(0.01, ok=False)
+    working = BackendHealth("ollama")
+    working.record(2.0, ok=True)
+
+    assert failing.state == BackendHealth.CLOSED
+    assert failing.score() > working.score()
+    assert BackendHealth("unmeasured").score() == 0.0
+
+
+def test_route_puts_the_failing_backend_last():
+    service = GeminiService()
+    try:
+        service._gemini_enabled = True
+        service._health["gemini"].record(0.01, ok=False)
+        service._health["ollama"].record(2.0, ok=True)
+        assert service._route() == ["ollama", "gemini"]
+    finally:
+        asyncio.run(service.aclose())
+
+
+class _StalledModel:
+    """Gemini stand-in whose stream blocks before its first chunk until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def generate_content(self, prompt, stream=False):
+        self.release.wait(10)
+        yield SimpleNamespace(text="late")
+
+
+async def _stalled_stream(monkeypatch) -> None:
+    monkeypatch.setattr(gemini_service.settings, "gemini_first_chunk_timeout_seconds", 0.05)
+    service = GeminiService()
+    model = _StalledModel()
+    service._gemini_enabled = True
+    service._gemini_model = model
+
+    async def ollama_stream(prompt):
+        yield "from ollama"
+
+    service._ollama_stream = ollama_stream
+    admission = service._admission["gemini"]
+    try:
+        chunks = [chunk async for chunk in service._generate_stream("hello")]
+        assert chunks == ["from ollama"]
+        # The bridge thread is still blocked in the iterator, so it keeps its slot.
+        assert admission.stats()["active"] == 1
+
+        model.release.set()
+        for _ in range(200):
+            if admission.stats()["active"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert admission.stats()["active"] == 0
+    finally:
+        model.release.set()
+        await service.aclose()
+
+
+def test_stalled_gemini_stream_holds_its_slot_until_the_thread_exits(monkeypatch):
+    asyncio.run(_stalled_stream(monkeypatch))
+
+
+class _BreaksAfterOneChunk(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        yield json.dumps({"response": "Partial answer about war"}).encode() + b"\n"
+        raise httpx.ReadError("connection reset")
+
+
+async def _interrupted_stream() -> tuple:
+    service = GeminiService()
+    service._gemini_enabled = False
+    service._http = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, stream=_BreaksAfterOneChunk()))
+    )
+    try:
+        events = [event async for event in _sse_events(service.stream_medicine_pairs([["aspirin", "warfarin"]]))]
+        return events, service._cache.stats()["entries"]
+    finally:
+        await service.aclose()
+
+
+def test_stream_cut_off_mid_response_ends_with_error_and_is_not_cached():
+    events, cached = asyncio.run(_interrupted_stream())
+    assert "Partial answer about war" in events[0]
+    assert events[-1].startswith("event: error")
+    assert not any(event.startswith("event: done") for event in events)
+    assert cached == 0
+
+
+async def _cancel_then_rejoin() -> str:
+    service = GeminiService()
+    calls = []
+
+    async def generate(prompt):
+        calls.append(prompt)
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            # Unwinding takes a moment, as a real backend call does.
+            await asyncio.sleep(0.01)
+            raise
+        return "answer"
+
+    service._generate = generate
+    try:
+        first = asyncio.ensure_future(service._cached_generate("key", "prompt"))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        # Arrives while the abandoned task is still unwinding.
+        answer = await service._cached_generate("key", "prompt")
+        assert len(calls) == 2
+        return answer
+    finally:
+        await service.aclose()
+
+
+def test_request_after_last_waiter_cancels_starts_a_new_flight():
+    assert asyncio.run(_cancel_then_rejoin()) == "answer"
@@ -0,0 +1,123 @@
+import asyncio
+import base64
+import itertools
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from app.database import AsyncSessionLocal
+from app.main import app
+from app.manage import init_db
+from app.models.user import User
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.security import create_access_token
+
+_users = itertools.count()
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+# Three medicines share each start date, so pages break inside a run of ties.
+START_DATES = [NOW - timedelta(days=d) for d in (1, 1, 1, 2, 2, 3, 3, 3)]
+
+
+async def _token(client: httpx.AsyncClient, guest: bool) -> str:
+    if guest:
+        return (await client.post("/api/auth/guest")).json()["access_token"]
+    await init_db(None)
+    n = next(_users)
+    async with AsyncSessionLocal() as db:
+        db.add(User(username=f"pager{n}", email=f"pager{n}@example.com", hashed_password="x"))
+        await db.commit()
+    return create_access_token({"sub": f"pager{n}"})
+
+
+async def _with_client(scenario, guest: bool):
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            client.headers["Authorization"] = f"Bearer {await _token(client, guest)}"
+            return await scenario(client)
+
+
+async def _all_pages(client: httpx.AsyncClient, url: str, limit: int) -> tuple:
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(url, params=params)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("guest", [False, True], ids=["registered", "guest"])
+def test_medicine_pages_split_ties_without_gaps_or_repeats(guest):
+    async def scenario(client):
+        for i, start in enumerate(START_DATES):
+            response = await client.post("/api/health/medicines", json={
+                "medicine_name": f"med{i}", "dosage": "1", "frequency": "daily",
+                "start_date": start.isoformat(),
+            })
+            assert response.status_code == 200
+        paged = await _all_pages(client, "/api/health/medicines", 3)
+        whole = (await client.get("/api/health/medicines", params={"limit": 500})).json()
+        return paged, whole
+
+    pages, whole = asyncio.run(_with_client(scenario, guest))
+    # The last page is short and comes without a cursor.
+    assert [len(p) for p in pages] == [3, 3, 2]
+    rows = [row for page in pages for row in page]
+    assert rows == whole
+    assert len({row["id"] for row in rows}) == len(START_DATES)
+    names = [row["medicine_name"] for row in rows]
+    assert sorted(names) == [f"med{i}" for i in range(len(START_DATES))]
+
+
+def test_guest_reading_pages_with_tied_timestamps():
+    async def scenario(client):
+        readings = [
+            {"timestamp": (NOW - timedelta(hours=h)).isoformat(), "heart_rate": 60 + i}
+            for i, h in enumerate((1, 1, 1, 1, 2, 2, 3))
+        ]
+        response = await client.post("/api/health/health-data/bulk", json=readings)
+        assert response.json()["inserted"] == len(readings)
+        return await _all_pages(client, "/api/health/health-data", 2)
+
+    pages = asyncio.run(_with_client(scenario, guest=True))
+    assert [len(p) for p in pages] == [2, 2, 2, 1]
+    rows = [row for page in pages for row in page]
+    assert [(r["timestamp"], r["id"]) for r in rows] == sorted(
+        ((r["timestamp"], r["id"]) for r in rows), reverse=True
+    )
+    assert len({r["id"] for r in rows}) == 7
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+BAD_CURSORS = [
+    "not a cursor!",
+    _b64(b"\xff\xfe"),
+    _b64(b'["2026-01-01T00:00:00", "seven"]'),
+    _b64(b'["yesterday", 7]'),
+    _b64(b"[1]"),
+    _b64(b"null"),
+]
+
+
+@pytest.mark.parametrize("guest", [False, True], ids=["registered", "guest"])
+def test_invalid_cursor_is_rejected(guest):
+    urls = ["/api/health/medicines", "/api/health/health-data"]
+    if not guest:
+        urls.append("/api/appointments/")
+
+    async def scenario(client):
+        return [
+            (url, cursor, (await client.get(url, params={"cursor": cursor})).status_code)
+            for url in urls
+            for cursor in BAD_CURSORS
+        ]
+
+    for url, cursor, status in asyncio.run(_with_client(scenario, guest)):
+        assert status == 400, (url, cursor)
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+from app.utils.security import PasswordHasher
+
+
+def test_cancelled_hash_keeps_its_slot_until_the_thread_finishes():
+    release = threading.Event()
+    started = []
+
+    def slow_hash(password):
+        started.append(password)
+        release.wait(5)
+        return f"hashed:{password}"
+
+    async def run():
+        hasher = PasswordHasher(workers=1, max_queue=4, queue_timeout=5)
+        try:
+            first = asyncio.ensure_future(hasher._run(slow_hash, "a"))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            await asyncio.sleep(0)
+            # The bcrypt thread is still busy, so the next hash has to wait for it.
+            second = asyncio.ensure_future(hasher._run(slow_hash, "b"))
+            await asyncio.sleep(0.05)
+            active, queued = hasher.stats()["active"], hasher.stats()["queued"]
+            release.set()
+            return first.cancelled(), active, queued, await second, hasher.stats()["active"]
+        finally:
+            release.set()
+            hasher.shutdown()
+
+    cancelled, active, queued, second, active_after = asyncio.run(run())
+    assert cancelled
+    assert (active, queued) == (1, 1)
+    assert second == "hashed:b"
+    assert active_after == 0
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from app.database import AsyncSessionLocal, engine
+from app.main import app
+from app.manage import init_db
+from app.models.health_data import HealthData
+from app.models.user import User
+from app.utils.security import create_access_token
+
+
+async def _seed(users: int) -> list:
+    await init_db(None)
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        accounts = [
+            User(username=f"reader{i}", email=f"reader{i}@example.com", hashed_password="x")
+            for i in range(users)
+        ]
+        db.add_all(accounts)
+        await db.flush()
+        # No TrendState rows, so every trends request rebuilds on the primary.
+        db.add_all(
+            HealthData(user_id=u.id, timestamp=now - timedelta(hours=h), heart_rate=70 + h)
+            for u in accounts
+            for h in range(5)
+        )
+        await db.commit()
+        return [u.username for u in accounts]
+
+
+async def _concurrent_trends(users: int) -> list:
+    usernames = await _seed(users)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            requests = [
+                client.get(
+                    "/api/health/health-trends",
+                    headers={"Authorization": f"Bearer {create_access_token({'sub': name})}"},
+                )
+                for name in usernames
+            ]
+            return await asyncio.wait_for(asyncio.gather(*requests), timeout=20)
+
+
+def test_concurrent_trend_rebuilds_do_not_exhaust_the_pool():
+    # More requests than the pool has connections, pool size plus overflow.
+    users = engine.pool.size() + engine.pool._max_overflow + 5
+    responses = asyncio.run(_concurrent_trends(users))
+    assert [r.status_code for r in responses] == [200] * users
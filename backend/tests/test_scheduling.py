@@ -0,0 +1,108 @@
+import asyncio
+import itertools
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import update
+
+from app.database import AsyncSessionLocal
+from app.main import app
+from app.manage import init_db
+from app.models.appointment import Appointment
+from app.models.user import User
+from app.services.scheduling import IntervalIndex
+from app.utils.security import create_access_token
+
+T0 = datetime(2030, 1, 7, 9, tzinfo=timezone.utc)
+_users = itertools.count()
+
+
+def _at(minutes: int) -> datetime:
+    return T0 + timedelta(minutes=minutes)
+
+
+def test_interval_index_merges_and_bisects():
+    index = IntervalIndex([(_at(60), _at(90)), (_at(0), _at(30)), (_at(20), _at(45))])
+    assert len(index) == 2  # the first two merge into [0, 45)
+    assert index.overlaps(_at(40), _at(50))
+    assert index.overlaps(_at(10), _at(15))  # contained
+    assert index.overlaps(_at(-10), _at(100))  # contains
+    assert not index.overlaps(_at(45), _at(60))  # end == start on both sides
+    assert not index.overlaps(_at(-30), _at(0))
+
+    index.add(_at(45), _at(60))
+    assert index.overlaps(_at(50), _at(55))
+    assert not index.overlaps(_at(90), _at(120))
+
+
+def _booking(minutes: int, duration: int = 30) -> dict:
+    return {
+        "doctor_name": "Dr. Test",
+        "appointment_date": _at(minutes).isoformat(),
+        "duration_minutes": duration,
+        "reason": "checkup",
+    }
+
+
+async def _with_client(scenario):
+    await init_db(None)
+    n = next(_users)
+    async with AsyncSessionLocal() as db:
+        user = User(username=f"patient{n}", email=f"patient{n}@example.com", hashed_password="x")
+        db.add(user)
+        await db.commit()
+    token = create_access_token({"sub": user.username})
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport,
+            base_url="http://test",
+            headers={"Authorization": f"Bearer {token}"},
+        ) as client:
+            return await scenario(client)
+
+
+def test_single_bookings_reject_overlaps_but_allow_adjacent():
+    async def scenario(client):
+        first = await client.post("/api/appointments/", json=_booking(0, 60))
+        statuses = [first.status_code]
+        for minutes, duration in ((30, 60), (15, 15), (-30, 31), (60, 30), (-30, 30)):
+            response = await client.post("/api/appointments/", json=_booking(minutes, duration))
+            statuses.append(response.status_code)
+        return statuses
+
+    # overlap, contained, overlaps the start by a minute, adjacent after, adjacent before
+    assert asyncio.run(_with_client(scenario)) == [200, 400, 400, 400, 200, 200]
+
+
+def test_bulk_booking_reports_conflicts_within_the_batch():
+    async def scenario(client):
+        await client.post("/api/appointments/", json=_booking(0, 30))
+        batch = [
+            _booking(60, 60),   # ok
+            _booking(90, 15),   # inside the first of this batch
+            _booking(10, 10),   # inside the existing booking
+            _booking(120, 30),  # adjacent to the first of this batch
+        ]
+        return (await client.post("/api/appointments/bulk", json=batch)).json()
+
+    body = asyncio.run(_with_client(scenario))
+    assert [c["index"] for c in body["created"]] == [0, 3]
+    assert body["conflicts"] == [
+        {"index": 1, "error": "Overlaps an earlier appointment in this request"},
+        {"index": 2, "error": "Overlaps an existing appointment"},
+    ]
+
+
+def test_cancelled_booking_frees_its_slot():
+    async def scenario(client):
+        booked = (await client.post("/api/appointments/", json=_booking(0, 30))).json()
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Appointment).where(Appointment.id == booked["id"]).values(status="cancelled")
+            )
+            await db.commit()
+        # Same start, so the partial unique index has to skip the cancelled row too.
+        return (await client.post("/api/appointments/", json=_booking(0, 45))).status_code
+
+    assert asyncio.run(_with_client(scenario)) == 200
@@ -0,0 +1,96 @@
+import asyncio
+import random
+from datetime import datetime, time, timedelta, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, engine
+from app.manage import init_db
+from app.models.health_data import HealthData
+from app.models.trend_stats import TrendState
+from app.models.user import User
+from app.services import trend_stats
+from app.services.prediction_service import METRICS, predict_trends
+
+DAY0 = datetime.combine(datetime.now(timezone.utc).date(), time.min, tzinfo=timezone.utc) - timedelta(days=6)
+rng = random.Random(7)
+
+
+def _reading(day: int, hour: float) -> dict:
+    x = day * 24 + hour
+    reading = {
+        "timestamp": DAY0 + timedelta(days=day, hours=hour),
+        "heart_rate": 70 + 0.05 * x + rng.gauss(0, 2),
+        "blood_pressure_systolic": 130 - 0.02 * x + rng.gauss(0, 3),
+    }
+    if rng.random() < 0.6:
+        reading["weight"] = 80 + 0.01 * x + rng.gauss(0, 0.5)  # gaps, like real data
+    return reading
+
+
+# Batches in the order they arrive. After the first, each adds several
+# readings to a day bucket an earlier batch started, so the merge has to
+# re-base non-zero sums, and crosses into the next day; the last one is older
+# than what came before.
+BATCHES = [
+    [_reading(0, h) for h in (1, 5, 9)],
+    [_reading(0, h) for h in (12, 15, 20)] + [_reading(1, h) for h in (2, 3)],
+    [_reading(1, h) for h in (10, 8, 9)] + [_reading(2, h) for h in (2, 1)],  # shuffled
+    [_reading(2, h) for h in (5, 6, 23.9)] + [_reading(3, 0.1)],
+    [_reading(1, 11), _reading(4, 1)],  # out of order: marks the state stale
+]
+
+
+def _closed_form(rows: list) -> dict:
+    """np.polyfit of each metric against the row's position in timestamp order."""
+    rows = sorted(rows, key=lambda r: r["timestamp"])
+    fits = {}
+    for metric in METRICS:
+        points = [(x, r[metric]) for x, r in enumerate(rows) if r.get(metric) is not None]
+        if len(points) > 2:
+            xs, ys = zip(*points)
+            fits[metric] = tuple(np.polyfit(xs, ys, 1))
+    return fits
+
+
+def _line(prediction: dict, n_rows: int) -> tuple:
+    slope = prediction["trend_strength"] * (1 if prediction["current_trend"] == "increasing" else -1)
+    return slope, prediction["next_7_days"][0] - slope * n_rows
+
+
+async def _run() -> list:
+    await init_db(None)
+    checks = []
+    try:
+        async with AsyncSessionLocal() as db:
+            user = User(username="trendfit", email="trendfit@example.com", hashed_password="x")
+            db.add(user)
+            await db.commit()
+            stored = []
+            for i, batch in enumerate(BATCHES):
+                db.add_all(HealthData(user_id=user.id, **r) for r in batch)
+                if i:  # the first trend request below builds the state
+                    await trend_stats.record_readings(db, user.id, batch)
+                await db.commit()
+                stored += batch
+                stale = (
+                    await db.execute(select(TrendState.stale).where(TrendState.user_id == user.id))
+                ).scalar()
+                checks.append((list(stored), stale, await trend_stats.get_trends(db, user.id)))
+    finally:
+        await engine.dispose()
+    return checks
+
+
+def test_incremental_buckets_match_the_closed_form_fit():
+    checks = asyncio.run(_run())
+    assert [stale for _, stale, _ in checks] == [None, False, False, False, True]
+    for stored, _, trends in checks:
+        expected = _closed_form(stored)
+        assert set(trends) == set(expected) == set(predict_trends(stored))
+        batch_fit = predict_trends(stored)
+        for metric, (slope, intercept) in expected.items():
+            assert _line(trends[metric], len(stored)) == pytest.approx((slope, intercept), rel=1e-9, abs=1e-9)
+            assert trends[metric]["next_7_days"] == pytest.approx(batch_fit[metric]["next_7_days"], rel=1e-9)
@@ -77,6 +77,20 @@ api.interceptors.response.use(
   }
 );
 
+// List routes return one page at a time and put the next page's cursor in
+// X-Next-Cursor; follow it so callers get every row in response.data.
+const getAllPages = async (url, params = {}) => {
+  const rows = [];
+  let cursor;
+  let response;
+  do {
+    response = await api.get(url, { params: { ...params, limit: 500, cursor } });
+    rows.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return { ...response, data: rows };
+};
+
 export const authAPI = {
   register: (data) => api.post('/auth/register', data),
   
@@ -125,7 +139,7 @@ export const healthAPI = {
   getHealthData: (days = 30) => api.get(`/health/health-data?days=${days}`),
   getHealthTrends: () => api.get('/health/health-trends'),
   addMedicine: (data) => api.post('/health/medicines', data),
-  getMedicines: () => api.get('/health/medicines'),
+  getMedicines: () => getAllPages('/health/medicines'),
   clearGuestData: () => api.delete('/health/clear-guest-data'),
 };
 
@@ -138,7 +152,7 @@ export const chatAPI = {
 export const appointmentAPI = {
   createAppointment: (data) => api.post('/appointments/', data),
   getAppointments: (includePast = false) =>
-    api.get(`/appointments/?include_past=${includePast}`),
+    getAllPages('/appointments/', { include_past: includePast }),
   optimizeAppointments: () => api.get('/appointments/optimize'),
 };
 
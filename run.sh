@@ -29,9 +29,13 @@ fi
 source venv/bin/activate
 
 # Install requirements
-echo "Installing backend dependencies (this may take a minute for large packages like pandas or scikit-learn)..."
+echo "Installing backend dependencies..."
 pip install -r requirements.txt
 
+# Create or upgrade the database schema (the server no longer does this on startup)
+echo "Preparing database..."
+python3 -m app.manage init-db || exit
+
 # Run the FastAPI server in the background
 echo "Running FastAPI server..."
 python3 -m uvicorn app.main:app --reload --port 8000 &